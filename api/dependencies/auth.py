@@ -0,0 +1,13 @@
+from fastapi import Depends, Header, HTTPException
+from typing import Annotated, Optional
+
+
+def get_user_id_from_header(x_user_id: Optional[str] = Header(None)) -> str:
+    """Extract user ID from header"""
+    if not x_user_id:
+        raise HTTPException(status_code=401, detail="User authentication required. Missing X-User-Id header")
+    return x_user_id
+
+
+# Authenticated user ID resolved from the X-User-Id header
+UserId = Annotated[str, Depends(get_user_id_from_header)]
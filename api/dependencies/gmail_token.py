@@ -1,21 +1,19 @@
-from fastapi import Header, HTTPException
+from fastapi import HTTPException
 from datetime import datetime, timedelta
-from typing import Optional
 from db.repository_factory import get_provider_token_repository
-from api.dependencies.providers import get_oauth_provider
-from core.auth.token_refresher import TokenRefresher
+from api.dependencies.providers import get_oauth_provider, get_token_refresher
+from core.auth.access_token_cache import cache_access_token, get_cached_access_token
+from api.dependencies.auth import UserId
 from utils.logger import logger
 
 
-async def get_valid_gmail_token(
-    x_user_id: Optional[str] = Header(None)
-) -> str:
+async def get_valid_gmail_token(x_user_id: UserId) -> str:
     """
     Dependency that ensures user has valid Gmail token.
     Auto-refreshes if expired.
     
     Args:
-        x_user_id: User ID from header
+        x_user_id: User ID from header (resolved once per request by UserId)
         
     Returns:
         Valid Gmail access token
@@ -23,15 +21,14 @@ async def get_valid_gmail_token(
     Raises:
         HTTPException: If user not authenticated or token invalid
     """
-    if not x_user_id:
-        raise HTTPException(
-            status_code=401,
-            detail="Authentication required. Missing X-User-Id header"
-        )
-    
+    # A token already known to be live needs no lookup
+    cached_token = get_cached_access_token(x_user_id, "google")
+    if cached_token:
+        return cached_token
+
     try:
         # Get token repository
-        token_repo = await get_provider_token_repository()
+        token_repo = get_provider_token_repository()
         provider_token = await token_repo.get_by_user_and_provider(x_user_id, "google")
         
         if not provider_token:
@@ -46,6 +43,7 @@ async def get_valid_gmail_token(
         if provider_token.expiry > buffer_time:
             # Token is still valid
             logger.info(f"Using existing valid token for user {x_user_id}")
+            cache_access_token(x_user_id, "google", provider_token.access_token, provider_token.expiry)
             return provider_token.access_token
         
         # Token expired or about to expire - refresh it
@@ -59,7 +57,7 @@ async def get_valid_gmail_token(
         
         # Get OAuth provider and refresh token
         oauth_provider = await get_oauth_provider("google")
-        token_refresher = TokenRefresher(token_repo)
+        token_refresher = await get_token_refresher()
         
         access_token = await token_refresher.ensure_valid_token(
             x_user_id, "google", oauth_provider
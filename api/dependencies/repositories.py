@@ -0,0 +1,34 @@
+from core.interfaces.repositories import (
+    CampaignRepository,
+    ContactRepository,
+    PromptRepository,
+    TemplateRepository
+)
+from db.repository_factory import (
+    get_campaign_repository,
+    get_contact_repository,
+    get_prompt_repository,
+    get_template_repository
+)
+
+
+# Repository getters are sync; async wrappers keep FastAPI from dispatching them to the threadpool
+
+async def contact_repository() -> ContactRepository:
+    """Resolve the contact repository singleton"""
+    return get_contact_repository()
+
+
+async def prompt_repository() -> PromptRepository:
+    """Resolve the prompt repository singleton"""
+    return get_prompt_repository()
+
+
+async def template_repository() -> TemplateRepository:
+    """Resolve the template repository singleton"""
+    return get_template_repository()
+
+
+async def campaign_repository() -> CampaignRepository:
+    """Resolve the campaign repository singleton"""
+    return get_campaign_repository()
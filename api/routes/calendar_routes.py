@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Header, HTTPException
-from typing import Optional, List
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import ORJSONResponse
+from typing import List
 from datetime import datetime, timedelta
 import httpx
 
 from db.mongodb.calendar_repository import MongoCalendarRepository
 from integrations.calcom_client import CalComClient
+from core.campaigns.auto_reply_cache import invalidate_auto_reply_cache
+from api.dependencies.auth import UserId
 from utils.logger import logger
 from core.calendar.models import (
     ConnectCalendarRequest,
@@ -12,7 +15,7 @@ from core.calendar.models import (
     EventTypeItem,
     EventTypesResponse,
     UpdateEventTypeRequest,
-    CalendarSlot,
+    CalendarSlotDict,
     AvailabilityResponse,
     BookMeetingRequest,
     BookingResponse,
@@ -23,22 +26,13 @@ from core.calendar.models import (
 router = APIRouter(prefix="/calendar")
 
 
-def get_user_id_from_header(x_user_id: Optional[str] = Header(None)) -> str:
-    """Extract user ID from header"""
-    if not x_user_id:
-        raise HTTPException(status_code=401, detail="User authentication required. Missing X-User-Id header")
-    return x_user_id
-
-
 # works fine 
 @router.post("/connect", response_model=CalendarStatusResponse)
 async def connect_calendar(
     request: ConnectCalendarRequest,
-    x_user_id: Optional[str] = Header(None)
+    user_id: UserId
 ):
     """Connect Cal.com calendar"""
-    user_id = get_user_id_from_header(x_user_id)
-
     try:
         # Log incoming request details
         api_key_length = len(request.api_key) if request.api_key else 0
@@ -95,6 +89,7 @@ async def connect_calendar(
             event_type_slug=request.event_type_slug,
             event_type_name=request.event_type_name
         )
+        invalidate_auto_reply_cache(user_id)
 
         return CalendarStatusResponse(
             connected=True,
@@ -129,11 +124,9 @@ def _get_event_type_from_token(token: dict, client: CalComClient):
 
 @router.get("/status", response_model=CalendarStatusResponse)
 async def get_calendar_status(
-    x_user_id: Optional[str] = Header(None)
+    user_id: UserId
 ):
     """Get calendar connection status"""
-    user_id = get_user_id_from_header(x_user_id)
-
     try:
         calendar_repo = MongoCalendarRepository()
         token = await calendar_repo.get_by_user(user_id, "cal.com")
@@ -159,11 +152,9 @@ async def get_calendar_status(
 @router.put("/toggle-tools", response_model=CalendarStatusResponse)
 async def toggle_calendar_tools(
     request: ToggleCalToolsRequest,
-    x_user_id: Optional[str] = Header(None)
+    user_id: UserId
 ):
     """Toggle AI calendar tools (get availability, book meetings)"""
-    user_id = get_user_id_from_header(x_user_id)
-
     try:
         calendar_repo = MongoCalendarRepository()
         token = await calendar_repo.get_by_user(user_id, "cal.com")
@@ -176,6 +167,8 @@ async def toggle_calendar_tools(
         if not updated:
             raise HTTPException(status_code=500, detail="Failed to update toggle")
 
+        invalidate_auto_reply_cache(user_id)
+
         return CalendarStatusResponse(
             connected=True,
             provider="cal.com",
@@ -195,11 +188,9 @@ async def toggle_calendar_tools(
 
 @router.get("/event-types", response_model=EventTypesResponse)
 async def get_event_types(
-    x_user_id: Optional[str] = Header(None)
+    user_id: UserId
 ):
     """Get available event types from Cal.com"""
-    user_id = get_user_id_from_header(x_user_id)
-
     try:
         calendar_repo = MongoCalendarRepository()
         token = await calendar_repo.get_by_user(user_id, "cal.com")
@@ -239,13 +230,11 @@ async def get_event_types(
 
 @router.get("/availability", response_model=AvailabilityResponse)
 async def get_availability(
+    user_id: UserId,
     days: int = 14,
-    timezone: str = "UTC",
-    x_user_id: Optional[str] = Header(None)
+    timezone: str = "UTC"
 ):
     """Get available slots for the stored Cal.com connection"""
-    user_id = get_user_id_from_header(x_user_id)
-
     try:
         calendar_repo = MongoCalendarRepository()
         token = await calendar_repo.get_by_user(user_id, "cal.com")
@@ -309,7 +298,7 @@ async def get_availability(
                 value = value.replace("Z", "+00:00")
             return datetime.fromisoformat(value)
 
-        formatted_slots = []
+        formatted_slots: List[CalendarSlotDict] = []
         default_duration = event_type_duration or 30
 
         for slot in slots:
@@ -324,21 +313,22 @@ async def get_availability(
             else:
                 end_dt = start_dt + timedelta(minutes=default_duration)
 
-            formatted_slots.append(
-                CalendarSlot(
-                    start=start_dt,
-                    end=end_dt,
-                    time_zone=slot_tz
-                )
-            )
-
-        return AvailabilityResponse(
-            connected=True,
-            event_type_id=event_type_id,
-            event_type_name=event_type_name,
-            booking_link=f"https://cal.com/{token.get('username')}/{event_type_slug}" if event_type_slug else None,
-            slots=formatted_slots
-        )
+            # Values are already parsed above, so orjson can encode them without a model per slot
+            formatted_slots.append({
+                "start": start_dt,
+                "end": end_dt,
+                "time_zone": slot_tz
+            })
+
+        # Returning a Response skips re-validating every slot against response_model
+        return ORJSONResponse({
+            "connected": True,
+            "event_type_id": event_type_id,
+            "event_type_name": event_type_name,
+            "booking_link": f"https://cal.com/{token.get('username')}/{event_type_slug}" if event_type_slug else None,
+            "slots": formatted_slots,
+            "error": None
+        })
 
     except httpx.HTTPStatusError as e:
         logger.error(f"Cal.com API error: HTTP {e.response.status_code} - {e.response.text}")
@@ -353,11 +343,9 @@ async def get_availability(
 @router.post("/book", response_model=BookingResponse)
 async def book_meeting(
     request: BookMeetingRequest,
-    x_user_id: Optional[str] = Header(None)
+    user_id: UserId
 ):
     """Book a meeting using stored Cal.com credentials"""
-    user_id = get_user_id_from_header(x_user_id)
-
     try:
         calendar_repo = MongoCalendarRepository()
         token = await calendar_repo.get_by_user(user_id, "cal.com")
@@ -408,11 +396,9 @@ async def book_meeting(
 @router.put("/event-type", response_model=CalendarStatusResponse)
 async def update_event_type(
     request: UpdateEventTypeRequest,
-    x_user_id: Optional[str] = Header(None)
+    user_id: UserId
 ):
     """Update selected event type"""
-    user_id = get_user_id_from_header(x_user_id)
-
     try:
         calendar_repo = MongoCalendarRepository()
         token = await calendar_repo.get_by_user(user_id, "cal.com")
@@ -447,11 +433,9 @@ async def update_event_type(
 
 @router.delete("/disconnect")
 async def disconnect_calendar(
-    x_user_id: Optional[str] = Header(None)
+    user_id: UserId
 ):
     """Disconnect calendar"""
-    user_id = get_user_id_from_header(x_user_id)
-
     try:
         calendar_repo = MongoCalendarRepository()
         success = await calendar_repo.delete_by_user(user_id, "cal.com")
@@ -459,6 +443,8 @@ async def disconnect_calendar(
         if not success:
             raise HTTPException(status_code=404, detail="Calendar not connected")
 
+        invalidate_auto_reply_cache(user_id)
+
         return {"success": True, "message": "Calendar disconnected"}
 
     except Exception as e:
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Header, HTTPException, Query, Depends
+from fastapi import APIRouter, HTTPException, Query, Depends
 from typing import Optional
 from core.campaigns.models import (
     CreateCampaignRequest,
@@ -16,62 +16,53 @@ from datetime import datetime
 from db.repository_factory import get_email_log_repository, get_campaign_repository, get_contact_repository, get_template_repository
 from api.dependencies.gmail_token import get_valid_gmail_token
 from integrations.trigger_client import trigger_client
+from core.campaigns.auto_reply_cache import invalidate_auto_reply_cache
+from core.templates.template_cache import get_template_cached
+from core.templates.template_service import TemplateService
+from api.dependencies.auth import UserId
 from utils.logger import logger
 
 
 router = APIRouter(prefix="/campaigns")
 
 
-def get_user_id_from_header(x_user_id: Optional[str] = Header(None)) -> str:
-    """Extract user ID from header"""
-    if not x_user_id:
-        raise HTTPException(status_code=401, detail="User authentication required. Missing X-User-Id header")
-    return x_user_id
-
-
 @router.post("/send", response_model=CampaignResultResponse)
 async def send_campaign(
     request: CreateCampaignRequest,
-    x_user_id: Optional[str] = Header(None),
+    user_id: UserId,
     gmail_token: str = Depends(get_valid_gmail_token)
 ):
     """Send email campaign via Trigger.dev (async background job)"""
-    user_id = get_user_id_from_header(x_user_id)
-    
     try:
         # Get repositories
-        campaign_repo = await get_campaign_repository()
-        contact_repo = await get_contact_repository()
-        template_repo = await get_template_repository()
+        campaign_repo = get_campaign_repository()
+        contact_repo = get_contact_repository()
+        template_repo = get_template_repository()
         
         # Validate template exists and belongs to user
-        template = await template_repo.get_by_id(request.template_id)
+        template = await get_template_cached(template_repo, request.template_id)
         if not template:
             raise HTTPException(status_code=404, detail="Template not found")
         if template.user_id != user_id:
             raise HTTPException(status_code=403, detail="Access denied to template")
         
         # Get contacts count
-        contacts = await contact_repo.get_contacts_by_source(
-            user_id, request.csv_source, skip=0, limit=10000
-        )
+        total_contacts = await contact_repo.count_by_source(user_id, request.csv_source)
         
-        if not contacts:
+        if not total_contacts:
             raise HTTPException(status_code=404, detail=f"No contacts found in {request.csv_source}")
         
-        total_contacts = len(contacts)
-        
         # Auto-generate campaign name if not provided
         campaign_name = request.name or f"Campaign - {template.name} - {datetime.utcnow().strftime('%Y-%m-%d %H:%M')}"
         
         # Validate prompt if provided
         if request.prompt_id:
             from db.repository_factory import get_prompt_repository
-            prompt_repo = await get_prompt_repository()
-            prompt = await prompt_repo.get_by_id(request.prompt_id)
-            if not prompt:
+            prompt_repo = get_prompt_repository()
+            prompt_owner = await prompt_repo.get_owner(request.prompt_id)
+            if not prompt_owner:
                 raise HTTPException(status_code=404, detail="Prompt not found")
-            if prompt.user_id != user_id:
+            if prompt_owner != user_id:
                 raise HTTPException(status_code=403, detail="Access denied to prompt")
         
         # Create campaign record
@@ -87,7 +78,7 @@ async def send_campaign(
         
         # Get provider token for refresh capability
         from db.repository_factory import get_provider_token_repository
-        token_repo = await get_provider_token_repository()
+        token_repo = get_provider_token_repository()
         provider_token = await token_repo.get_by_user_and_provider(user_id, "google")
         
         # Trigger background job
@@ -135,16 +126,14 @@ async def send_campaign(
 
 @router.get("", response_model=CampaignsListResponse)
 async def list_campaigns(
-    x_user_id: Optional[str] = Header(None),
+    user_id: UserId,
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=100),
     status: Optional[str] = Query(None)
 ):
     """List all campaigns for user"""
-    user_id = get_user_id_from_header(x_user_id)
-    
     try:
-        campaign_repo = await get_campaign_repository()
+        campaign_repo = get_campaign_repository()
         
         skip = (page - 1) * page_size
         
@@ -200,16 +189,14 @@ async def list_campaigns(
 
 @router.get("/logs", response_model=EmailLogsResponse)
 async def get_all_email_logs(
-    x_user_id: Optional[str] = Header(None),
+    user_id: UserId,
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=100),
     status: Optional[str] = Query(None)
 ):
     """Get all email logs for the user across all campaigns"""
-    user_id = get_user_id_from_header(x_user_id)
-    
     try:
-        log_repo = await get_email_log_repository()
+        log_repo = get_email_log_repository()
         
         skip = (page - 1) * page_size
         
@@ -253,13 +240,11 @@ async def get_all_email_logs(
 @router.get("/{campaign_id}", response_model=CampaignDetailResponse)
 async def get_campaign(
     campaign_id: str,
-    x_user_id: Optional[str] = Header(None)
+    user_id: UserId
 ):
     """Get campaign details"""
-    user_id = get_user_id_from_header(x_user_id)
-    
     try:
-        campaign_repo = await get_campaign_repository()
+        campaign_repo = get_campaign_repository()
         campaign = await campaign_repo.get_by_id(campaign_id)
         
         if not campaign:
@@ -304,56 +289,52 @@ async def get_campaign(
 @router.post("/preview", response_model=CampaignPreviewResponse)
 async def preview_campaign(
     request: PreviewCampaignRequest,
-    x_user_id: Optional[str] = Header(None)
+    user_id: UserId
 ):
     """Preview how campaign will look with first contact"""
-    user_id = get_user_id_from_header(x_user_id)
-    
     try:
         # Get repositories
-        contact_repo = await get_contact_repository()
-        template_repo = await get_template_repository()
+        contact_repo = get_contact_repository()
+        template_repo = get_template_repository()
         
         # Get template
-        template = await template_repo.get_by_id(request.template_id)
+        template = await get_template_cached(template_repo, request.template_id)
         if not template:
             raise HTTPException(status_code=404, detail="Template not found")
         if template.user_id != user_id:
             raise HTTPException(status_code=403, detail="Access denied to template")
         
-        # Get first contact from CSV source
-        contacts = await contact_repo.get_contacts_by_source(
-            user_id, request.csv_source, skip=0, limit=1
-        )
+        # Get first contact from CSV source as a projected dict (no Contact construction)
+        contact = None
+        async for row in contact_repo.iter_render_rows(user_id, request.csv_source, limit=1):
+            contact = row
         
-        if not contacts:
+        if contact is None:
             raise HTTPException(status_code=404, detail=f"No contacts found in {request.csv_source}")
         
-        contact = contacts[0]
-        
-        # Prepare contact data
+        # Prepare contact data, merging custom fields only when the contact has any
         contact_data = {
-            "name": contact.name or "there",
-            "email": contact.email,
-            "company": contact.company or "",
-            "phone": contact.phone or "",
-            **contact.custom_fields
+            "name": contact.get("name") or "there",
+            "email": contact["email"],
+            "company": contact.get("company") or "",
+            "phone": contact.get("phone") or ""
         }
+        custom_fields = contact.get("custom_fields")
+        if custom_fields:
+            contact_data.update(custom_fields)
         
-        # Simple template rendering (replace {{variable}} with values)
-        rendered_subject = template.subject
-        rendered_body = template.body
-        
-        for key, value in contact_data.items():
-            placeholder = "{{" + key + "}}"
-            rendered_subject = rendered_subject.replace(placeholder, str(value))
-            rendered_body = rendered_body.replace(placeholder, str(value))
+        # Render in one pass over the pre-split template (reused until the row changes)
+        compiled_subject, compiled_body = TemplateService.compile_stored(
+            template.id, template.updated_at, template.subject, template.body
+        )
+        rendered_subject = compiled_subject.render(contact_data)
+        rendered_body = compiled_body.render(contact_data)
         
         return CampaignPreviewResponse(
-            to=contact.email,
+            to=contact["email"],
             subject=rendered_subject,
             body=rendered_body,
-            contact_name=contact.name,
+            contact_name=contact.get("name"),
             template_name=template.name
         )
         
@@ -366,15 +347,13 @@ async def preview_campaign(
 
 @router.get("/logs", response_model=EmailLogsResponse)
 async def get_email_logs(
-    x_user_id: Optional[str] = Header(None),
+    user_id: UserId,
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=100)
 ):
     """Get email logs for user"""
-    user_id = get_user_id_from_header(x_user_id)
-    
     try:
-        log_repo = await get_email_log_repository()
+        log_repo = get_email_log_repository()
         
         # Calculate pagination
         skip = (page - 1) * page_size
@@ -413,13 +392,11 @@ async def get_email_logs(
 @router.get("/stats/{campaign_id}", response_model=CampaignStatsResponse)
 async def get_campaign_stats(
     campaign_id: str,
-    x_user_id: Optional[str] = Header(None)
+    user_id: UserId
 ):
     """Get statistics for a specific campaign"""
-    user_id = get_user_id_from_header(x_user_id)
-    
     try:
-        log_repo = await get_email_log_repository()
+        log_repo = get_email_log_repository()
         stats = await log_repo.get_campaign_stats(campaign_id)
         
         return CampaignStatsResponse(
@@ -438,16 +415,14 @@ async def get_campaign_stats(
 @router.get("/{campaign_id}/emails", response_model=EmailLogsResponse)
 async def get_campaign_emails(
     campaign_id: str,
-    x_user_id: Optional[str] = Header(None),
+    user_id: UserId,
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=100)
 ):
     """Get email logs for a specific campaign"""
-    user_id = get_user_id_from_header(x_user_id)
-    
     try:
         # Verify user owns this campaign
-        campaign_repo = await get_campaign_repository()
+        campaign_repo = get_campaign_repository()
         campaign = await campaign_repo.get_by_id(campaign_id)
         
         if not campaign:
@@ -455,7 +430,7 @@ async def get_campaign_emails(
         if campaign.user_id != user_id:
             raise HTTPException(status_code=403, detail="Access denied to campaign")
         
-        log_repo = await get_email_log_repository()
+        log_repo = get_email_log_repository()
         
         skip = (page - 1) * page_size
         logs = await log_repo.get_by_campaign(campaign_id, skip=skip, limit=page_size)
@@ -517,13 +492,11 @@ class AutoReplySettingsResponse(BaseModel):
 @router.get("/{campaign_id}/auto-reply", response_model=AutoReplySettingsResponse)
 async def get_auto_reply_settings(
     campaign_id: str,
-    x_user_id: Optional[str] = Header(None)
+    user_id: UserId
 ):
     """Get auto-reply settings for a campaign"""
-    user_id = get_user_id_from_header(x_user_id)
-    
     try:
-        campaign_repo = await get_campaign_repository()
+        campaign_repo = get_campaign_repository()
         campaign = await campaign_repo.get_by_id(campaign_id)
         
         if not campaign:
@@ -550,13 +523,11 @@ async def get_auto_reply_settings(
 async def update_auto_reply_settings(
     campaign_id: str,
     request: UpdateAutoReplyRequest,
-    x_user_id: Optional[str] = Header(None)
+    user_id: UserId
 ):
     """Update auto-reply settings for a campaign"""
-    user_id = get_user_id_from_header(x_user_id)
-    
     try:
-        campaign_repo = await get_campaign_repository()
+        campaign_repo = get_campaign_repository()
         campaign = await campaign_repo.get_by_id(campaign_id)
         
         if not campaign:
@@ -577,6 +548,8 @@ async def update_auto_reply_settings(
         if not updated:
             raise HTTPException(status_code=500, detail="Failed to update settings")
         
+        invalidate_auto_reply_cache(user_id)
+        
         return AutoReplySettingsResponse(
             auto_reply_enabled=updated.auto_reply_enabled,
             auto_reply_subject=updated.auto_reply_subject,
@@ -615,15 +588,13 @@ class ConversationsResponse(BaseModel):
 @router.get("/{campaign_id}/conversations", response_model=ConversationsResponse)
 async def get_campaign_conversations(
     campaign_id: str,
-    x_user_id: Optional[str] = Header(None),
+    user_id: UserId,
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=100)
 ):
     """Get conversations for a campaign"""
-    user_id = get_user_id_from_header(x_user_id)
-    
     try:
-        campaign_repo = await get_campaign_repository()
+        campaign_repo = get_campaign_repository()
         campaign = await campaign_repo.get_by_id(campaign_id)
         
         if not campaign:
@@ -631,7 +602,7 @@ async def get_campaign_conversations(
         if campaign.user_id != user_id:
             raise HTTPException(status_code=403, detail="Access denied")
         
-        conv_repo = await get_conversation_repository()
+        conv_repo = get_conversation_repository()
         
         skip = (page - 1) * page_size
         conversations = await conv_repo.get_by_campaign(campaign_id, skip=skip, limit=page_size)
@@ -684,13 +655,11 @@ class ConversationDetailResponse(BaseModel):
 async def get_conversation_detail(
     campaign_id: str,
     conversation_id: str,
-    x_user_id: Optional[str] = Header(None)
+    user_id: UserId
 ):
     """Get conversation with all messages"""
-    user_id = get_user_id_from_header(x_user_id)
-    
     try:
-        campaign_repo = await get_campaign_repository()
+        campaign_repo = get_campaign_repository()
         campaign = await campaign_repo.get_by_id(campaign_id)
         
         if not campaign:
@@ -698,7 +667,7 @@ async def get_conversation_detail(
         if campaign.user_id != user_id:
             raise HTTPException(status_code=403, detail="Access denied")
         
-        conv_repo = await get_conversation_repository()
+        conv_repo = get_conversation_repository()
         
         conversation = await conv_repo.get_by_id(conversation_id)
         if not conversation:
@@ -1,5 +1,5 @@
-from fastapi import APIRouter, UploadFile, File, Header, HTTPException, Query
-from typing import Optional
+import os
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Depends
 from core.csv.models import (
     ContactUploadResponse,
     ContactListResponse,
@@ -10,28 +10,29 @@ from core.csv.models import (
     CsvUploadItem
 )
 from core.csv.csv_service import CsvService
-from db.repository_factory import get_contact_repository
+from core.interfaces.repositories import ContactRepository
+from api.dependencies.repositories import contact_repository
+from api.dependencies.auth import UserId, get_user_id_from_header
 from utils.logger import logger
 
 
-router = APIRouter(prefix="/contacts")
+router = APIRouter(prefix="/contacts", dependencies=[Depends(get_user_id_from_header)])
 
 # File upload limits
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
-ALLOWED_EXTENSIONS = {".csv", ".txt"}
-
-
-def get_user_id_from_header(x_user_id: Optional[str] = Header(None)) -> str:
-    """Extract user ID from header"""
-    if not x_user_id:
-        raise HTTPException(status_code=401, detail="User authentication required. Missing X-User-Id header")
-    return x_user_id
+ALLOWED_EXTENSIONS = frozenset({".csv", ".txt"})
+# Leading bytes inspected to reject binary uploads (e.g. .xlsx renamed to .csv)
+SNIFF_SIZE = 1024
+# Contacts written per insert_many during an upload
+INSERT_BATCH_SIZE = 1000
 
 
 @router.post("/upload", response_model=ContactUploadResponse)
 async def upload_contacts(
+    user_id: UserId,
     file: UploadFile = File(...),
-    x_user_id: Optional[str] = Header(None)
+    contact_repo: ContactRepository = Depends(contact_repository),
+    skip_existing: bool = Query(False, description="Also skip emails already in the user's contacts")
 ):
     """
     Upload CSV file with contacts
@@ -40,18 +41,16 @@ async def upload_contacts(
     email,name,company,phone
     john@example.com,John Doe,Acme Inc,+1234567890
     """
-    user_id = get_user_id_from_header(x_user_id)
-    
     # Validate file
     if not file.filename:
         raise HTTPException(status_code=400, detail="No file provided")
     
     # Check file extension
-    file_ext = file.filename[file.filename.rfind('.'):].lower() if '.' in file.filename else ''
+    file_ext = os.path.splitext(file.filename)[1].lower()
     if file_ext not in ALLOWED_EXTENSIONS:
         raise HTTPException(
             status_code=400,
-            detail=f"Invalid file type. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"
+            detail=f"Invalid file type. Allowed types: {', '.join(sorted(ALLOWED_EXTENSIONS))}"
         )
     
     try:
@@ -65,6 +64,13 @@ async def upload_contacts(
                 detail=f"File too large. Maximum size: {MAX_FILE_SIZE / 1024 / 1024}MB"
             )
         
+        # Text CSVs never contain NUL bytes; reject binary files before parsing
+        if b"\x00" in content[:SNIFF_SIZE]:
+            raise HTTPException(
+                status_code=400,
+                detail="Invalid file content. Please upload a plain-text CSV file"
+            )
+        
         # Parse CSV
         csv_service = CsvService()
         contacts_data, parse_errors = await csv_service.parse_csv(
@@ -84,52 +90,60 @@ async def upload_contacts(
                 message=f"Failed to parse CSV: {'; '.join(parse_errors[:5])}"
             )
         
-        # Get repository
-        contact_repo = await get_contact_repository()
-        
-        # Detect duplicates within the CSV file only (not across all contacts)
+        # By default duplicates are detected within the CSV file only (not across all contacts)
         # Each CSV file is treated as a separate batch - same email can exist in different CSVs
+        existing_emails = set()
+        if skip_existing:
+            # One indexed query for the emails in this file rather than a lookup per row
+            existing_emails = await contact_repo.get_existing_emails(
+                user_id,
+                list({contact["email"] for contact in contacts_data})
+            )
+        
         unique_contacts, duplicate_emails = await csv_service.detect_duplicates(
             contacts_data,
-            set()  # Empty set - only detect duplicates within this CSV
+            existing_emails
         )
         
-        # Bulk create contacts
-        created_contacts = []
-        if unique_contacts:
-            created_contacts = await contact_repo.bulk_create_contacts(unique_contacts)
-        
-        # Convert to response models
-        contact_items = [
-            ContactItem(
-                id=contact.id,
-                email=contact.email,
-                name=contact.name,
-                company=contact.company,
-                phone=contact.phone,
-                custom_fields=contact.custom_fields,
-                source=contact.source,
-                created_at=contact.created_at,
-                updated_at=contact.updated_at
+        # Bulk create contacts in fixed-size batches, converting each batch to response
+        # models straight away so only one batch of documents is held at a time
+        contact_items = []
+        for start in range(0, len(unique_contacts), INSERT_BATCH_SIZE):
+            created_batch = await contact_repo.bulk_create_contacts(
+                unique_contacts[start:start + INSERT_BATCH_SIZE]
+            )
+            contact_items.extend(
+                ContactItem(
+                    id=contact.id,
+                    email=contact.email,
+                    name=contact.name,
+                    company=contact.company,
+                    phone=contact.phone,
+                    custom_fields=contact.custom_fields,
+                    source=contact.source,
+                    created_at=contact.created_at,
+                    updated_at=contact.updated_at
+                )
+                for contact in created_batch
             )
-            for contact in created_contacts
-        ]
         
         total_rows = len(contacts_data) + len(parse_errors)
+        # Rows the database rejected as already present in this source count as duplicates
+        duplicate_count = len(duplicate_emails) + len(unique_contacts) - len(contact_items)
         
         message_parts = []
-        if created_contacts:
-            message_parts.append(f"Successfully imported {len(created_contacts)} contacts")
-        if duplicate_emails:
-            message_parts.append(f"{len(duplicate_emails)} duplicates skipped")
+        if contact_items:
+            message_parts.append(f"Successfully imported {len(contact_items)} contacts")
+        if duplicate_count:
+            message_parts.append(f"{duplicate_count} duplicates skipped")
         if parse_errors:
             message_parts.append(f"{len(parse_errors)} invalid rows")
         
         return ContactUploadResponse(
-            success=len(created_contacts) > 0,
+            success=len(contact_items) > 0,
             total_rows=total_rows,
-            imported=len(created_contacts),
-            duplicates=len(duplicate_emails),
+            imported=len(contact_items),
+            duplicates=duplicate_count,
             invalid=len(parse_errors),
             message="; ".join(message_parts) if message_parts else "No contacts imported",
             contacts=contact_items
@@ -144,16 +158,13 @@ async def upload_contacts(
 
 @router.get("", response_model=ContactListResponse)
 async def list_contacts(
-    x_user_id: Optional[str] = Header(None),
+    user_id: UserId,
+    contact_repo: ContactRepository = Depends(contact_repository),
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(50, ge=1, le=100, description="Items per page")
 ):
     """List user's contacts with pagination"""
-    user_id = get_user_id_from_header(x_user_id)
-    
     try:
-        contact_repo = await get_contact_repository()
-        
         # Calculate pagination
         skip = (page - 1) * page_size
         
@@ -192,14 +203,11 @@ async def list_contacts(
 @router.delete("/{contact_id}", response_model=DeleteContactResponse)
 async def delete_contact(
     contact_id: str,
-    x_user_id: Optional[str] = Header(None)
+    user_id: UserId,
+    contact_repo: ContactRepository = Depends(contact_repository)
 ):
     """Delete a contact by ID"""
-    user_id = get_user_id_from_header(x_user_id)
-    
     try:
-        contact_repo = await get_contact_repository()
-        
         # TODO: Add authorization check to ensure contact belongs to user
         success = await contact_repo.delete_by_id(contact_id)
         
@@ -221,14 +229,11 @@ async def delete_contact(
 @router.delete("/by-source/{source:path}", response_model=DeleteContactResponse)
 async def delete_contacts_by_source(
     source: str,
-    x_user_id: Optional[str] = Header(None)
+    user_id: UserId,
+    contact_repo: ContactRepository = Depends(contact_repository)
 ):
     """Delete all contacts from a specific CSV source"""
-    user_id = get_user_id_from_header(x_user_id)
-    
     try:
-        contact_repo = await get_contact_repository()
-        
         deleted_count = await contact_repo.delete_by_source(user_id, source)
         
         if deleted_count > 0:
@@ -248,25 +253,17 @@ async def delete_contacts_by_source(
 
 @router.get("/stats", response_model=ContactStatsResponse)
 async def get_contact_stats(
-    x_user_id: Optional[str] = Header(None)
+    user_id: UserId,
+    contact_repo: ContactRepository = Depends(contact_repository)
 ):
     """Get contact statistics for user"""
-    user_id = get_user_id_from_header(x_user_id)
-    
     try:
-        contact_repo = await get_contact_repository()
-        
-        # Get all contacts for stats
-        all_contacts = await contact_repo.get_by_user(user_id, skip=0, limit=10000)
-        
-        # Calculate stats
-        sources = {}
-        for contact in all_contacts:
-            source = contact.source
-            sources[source] = sources.get(source, 0) + 1
+        # Per-source counts are grouped in the database rather than loading every contact
+        uploads = await contact_repo.get_csv_uploads_by_user(user_id)
+        sources = {upload["source"]: upload["contact_count"] for upload in uploads}
         
         return ContactStatsResponse(
-            total_contacts=len(all_contacts),
+            total_contacts=sum(sources.values()),
             sources=sources
         )
         
@@ -277,14 +274,11 @@ async def get_contact_stats(
 
 @router.get("/uploads", response_model=CsvUploadsListResponse)
 async def get_csv_uploads(
-    x_user_id: Optional[str] = Header(None)
+    user_id: UserId,
+    contact_repo: ContactRepository = Depends(contact_repository)
 ):
     """Get list of CSV uploads for user"""
-    user_id = get_user_id_from_header(x_user_id)
-    
     try:
-        contact_repo = await get_contact_repository()
-        
         # Get CSV uploads grouped by source
         uploads = await contact_repo.get_csv_uploads_by_user(user_id)
         
@@ -312,16 +306,13 @@ async def get_csv_uploads(
 @router.get("/by-source/{source}", response_model=ContactListResponse)
 async def get_contacts_by_source(
     source: str,
-    x_user_id: Optional[str] = Header(None),
+    user_id: UserId,
+    contact_repo: ContactRepository = Depends(contact_repository),
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(50, ge=1, le=100, description="Items per page")
 ):
     """Get contacts from a specific CSV source"""
-    user_id = get_user_id_from_header(x_user_id)
-    
     try:
-        contact_repo = await get_contact_repository()
-        
         # Calculate pagination
         skip = (page - 1) * page_size
         
@@ -331,10 +322,7 @@ async def get_contacts_by_source(
         )
         
         # Get total count for this source
-        all_contacts = await contact_repo.get_contacts_by_source(
-            user_id, source, skip=0, limit=10000
-        )
-        total = len(all_contacts)
+        total = await contact_repo.count_by_source(user_id, source)
         
         # Convert to response models
         contact_items = [
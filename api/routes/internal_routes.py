@@ -2,9 +2,12 @@
 Internal API routes
 These endpoints are called by Trigger.dev tasks (not by frontend)
 """
+import asyncio
+import orjson
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, AsyncIterator, Dict, Any
 from datetime import datetime
 from db.repository_factory import (
     get_email_log_repository, 
@@ -14,6 +17,11 @@ from db.repository_factory import (
     get_prompt_repository
 )
 from db.mongodb.calendar_repository import MongoCalendarRepository
+from core.campaigns.auto_reply_cache import (
+    auto_reply_campaigns_cache,
+    users_with_auto_reply_cache,
+    USERS_WITH_AUTO_REPLY_KEY
+)
 from integrations.calcom_client import CalComClient
 from datetime import datetime, timedelta
 from utils.logger import logger
@@ -33,11 +41,36 @@ class CreateEmailLogRequest(BaseModel):
     body: str
     status: str
     error_message: Optional[str] = None
-    sent_at: Optional[str] = None
+    sent_at: Optional[datetime] = None  # ISO-8601, parsed by pydantic
     gmail_message_id: Optional[str] = None
     gmail_thread_id: Optional[str] = None
 
 
+class BulkCreateEmailLogsRequest(BaseModel):
+    """Batch of email logs from one Trigger.dev send run"""
+    logs: List[CreateEmailLogRequest]
+
+
+async def _create_conversation_for_log(conv_repo, request: CreateEmailLogRequest, email_log_id: str) -> None:
+    """Start a conversation for a sent email unless its thread already has one"""
+    try:
+        created = await conv_repo.create_if_absent(
+            user_id=request.user_id,
+            campaign_id=request.campaign_id,
+            email_log_id=email_log_id,
+            contact_email=request.to_email,
+            gmail_thread_id=request.gmail_thread_id,
+            subject=request.subject,
+            body=request.body,
+            gmail_message_id=request.gmail_message_id or "",
+            sent_at=request.sent_at
+        )
+        if created:
+            logger.info(f"Created conversation for thread {request.gmail_thread_id}")
+    except Exception as conv_error:
+        logger.error(f"Error creating conversation: {str(conv_error)}")
+
+
 @router.post("/email-logs")
 async def create_email_log(request: CreateEmailLogRequest):
     """
@@ -45,16 +78,8 @@ async def create_email_log(request: CreateEmailLogRequest):
     Called by Trigger.dev after sending each email
     """
     try:
-        log_repo = await get_email_log_repository()
-        conv_repo = await get_conversation_repository()
-        
-        # Parse sent_at if provided
-        sent_at = None
-        if request.sent_at:
-            try:
-                sent_at = datetime.fromisoformat(request.sent_at.replace('Z', '+00:00'))
-            except:
-                sent_at = datetime.utcnow() if request.status == "sent" else None
+        log_repo = get_email_log_repository()
+        conv_repo = get_conversation_repository()
         
         # Create log
         log = await log_repo.create_log(
@@ -67,43 +92,14 @@ async def create_email_log(request: CreateEmailLogRequest):
             body=request.body,
             status=request.status,
             error_message=request.error_message,
-            sent_at=sent_at,
+            sent_at=request.sent_at,
             gmail_message_id=request.gmail_message_id,
             gmail_thread_id=request.gmail_thread_id
         )
         
         # If sent successfully and we have a thread ID, create a conversation
         if request.status == "sent" and request.gmail_thread_id:
-            try:
-                # Check if conversation already exists for this thread
-                existing = await conv_repo.get_by_thread_id(request.gmail_thread_id)
-                
-                if not existing:
-                    # Create new conversation
-                    conversation = await conv_repo.create_conversation(
-                        user_id=request.user_id,
-                        campaign_id=request.campaign_id,
-                        email_log_id=log.id,
-                        contact_email=request.to_email,
-                        gmail_thread_id=request.gmail_thread_id
-                    )
-                    
-                    # Add the initial message to conversation
-                    await conv_repo.add_message(
-                        conversation_id=conversation.id,
-                        campaign_id=request.campaign_id,
-                        direction="outbound",
-                        from_email="me",
-                        to_email=request.to_email,
-                        subject=request.subject,
-                        body=request.body,
-                        gmail_message_id=request.gmail_message_id or "",
-                        is_auto_reply=False,
-                        sent_at=sent_at
-                    )
-                    logger.info(f"Created conversation for thread {request.gmail_thread_id}")
-            except Exception as conv_error:
-                logger.error(f"Error creating conversation: {str(conv_error)}")
+            await _create_conversation_for_log(conv_repo, request, log.id)
         
         return {
             "success": True,
@@ -116,12 +112,50 @@ async def create_email_log(request: CreateEmailLogRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/email-logs/bulk")
+async def create_email_logs_bulk(request: BulkCreateEmailLogsRequest):
+    """
+    Create many email log entries in one insert
+    Called by Trigger.dev after sending a batch of emails; failed sends should be reported here
+    in bulk rather than one request each
+    """
+    try:
+        if not request.logs:
+            return {"success": True, "log_ids": []}
+
+        log_repo = get_email_log_repository()
+        conv_repo = get_conversation_repository()
+
+        logs = await log_repo.bulk_create_logs([item.model_dump() for item in request.logs])
+
+        # Conversations touch different threads, so they can be created concurrently
+        await asyncio.gather(*(
+            _create_conversation_for_log(conv_repo, item, log.id)
+            for item, log in zip(request.logs, logs)
+            if item.status == "sent" and item.gmail_thread_id
+        ))
+
+        return {
+            "success": True,
+            "log_ids": [log.id for log in logs]
+        }
+
+    except Exception as e:
+        logger.error(f"Error creating email logs: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/auto-reply-campaigns")
 async def get_auto_reply_campaigns(user_id: str = Query(...)):
     """Get campaigns with auto-reply enabled for a user"""
+    # Polled by the scheduler; configuration changes invalidate the entry explicitly
+    cached = auto_reply_campaigns_cache.get(user_id)
+    if cached is not None:
+        return cached
+    
     try:
-        campaign_repo = await get_campaign_repository()
-        prompt_repo = await get_prompt_repository()
+        campaign_repo = get_campaign_repository()
+        prompt_repo = get_prompt_repository()
         calendar_repo = MongoCalendarRepository()
         
         campaigns = await campaign_repo.get_campaigns_with_auto_reply(user_id)
@@ -132,14 +166,14 @@ async def get_auto_reply_campaigns(user_id: str = Query(...)):
         if calendar_token:
             cal_tools_enabled = calendar_token.get("cal_tools_enabled", True)
         
+        # Fetch all referenced prompts in one query
+        prompt_ids = {c.prompt_id for c in campaigns if c.prompt_id}
+        prompts = await prompt_repo.get_by_ids(prompt_ids) if prompt_ids else {}
+        
         result_campaigns = []
         for c in campaigns:
-            # Fetch prompt text if campaign has a prompt_id
-            prompt_text = None
-            if c.prompt_id:
-                prompt = await prompt_repo.get_by_id(c.prompt_id)
-                if prompt:
-                    prompt_text = prompt.prompt_text
+            prompt = prompts.get(c.prompt_id) if c.prompt_id else None
+            prompt_text = prompt.prompt_text if prompt else None
             
             result_campaigns.append({
                 "id": c.id,
@@ -153,7 +187,9 @@ async def get_auto_reply_campaigns(user_id: str = Query(...)):
                 "cal_tools_enabled": cal_tools_enabled,  # Whether AI can use calendar tools
             })
         
-        return {"campaigns": result_campaigns}
+        response = {"campaigns": result_campaigns}
+        auto_reply_campaigns_cache.set(user_id, response)
+        return response
     except Exception as e:
         logger.error(f"Error fetching auto-reply campaigns: {str(e)}")
         return {"campaigns": []}
@@ -163,7 +199,7 @@ async def get_auto_reply_campaigns(user_id: str = Query(...)):
 async def get_campaign_conversations(campaign_id: str):
     """Get active conversations for a campaign"""
     try:
-        conv_repo = await get_conversation_repository()
+        conv_repo = get_conversation_repository()
         conversations = await conv_repo.get_active_conversations_for_campaign(campaign_id)
         
         return {
@@ -187,7 +223,7 @@ async def get_campaign_conversations(campaign_id: str):
 async def check_message_exists(gmail_message_id: str):
     """Check if a message has already been processed"""
     try:
-        conv_repo = await get_conversation_repository()
+        conv_repo = get_conversation_repository()
         exists = await conv_repo.message_exists(gmail_message_id)
         return {"exists": exists}
     except Exception as e:
@@ -203,25 +239,18 @@ class RecordReplyRequest(BaseModel):
     from_email: str
     subject: str
     body: str
-    replied_at: str
+    replied_at: datetime  # ISO-8601, parsed by pydantic
 
 
 @router.post("/record-reply")
 async def record_reply(request: RecordReplyRequest):
     """Record an inbound reply from contact"""
     try:
-        conv_repo = await get_conversation_repository()
-        campaign_repo = await get_campaign_repository()
-        
-        # Parse replied_at
-        replied_at = datetime.utcnow()
-        try:
-            replied_at = datetime.fromisoformat(request.replied_at.replace('Z', '+00:00'))
-        except:
-            pass
+        conv_repo = get_conversation_repository()
+        campaign_repo = get_campaign_repository()
         
-        # Add message to conversation
-        await conv_repo.add_message(
+        # Add message to conversation; the unique gmail_message_id index rejects replays
+        message = await conv_repo.add_message(
             conversation_id=request.conversation_id,
             campaign_id=request.campaign_id,
             direction="inbound",
@@ -231,18 +260,22 @@ async def record_reply(request: RecordReplyRequest):
             body=request.body,
             gmail_message_id=request.gmail_message_id,
             is_auto_reply=False,
-            sent_at=replied_at
+            sent_at=request.replied_at
         )
         
-        # Update conversation
-        await conv_repo.update_on_reply(request.conversation_id, is_inbound=True)
+        if message is None:
+            logger.info(f"Reply {request.gmail_message_id} already recorded, skipping")
+            return {"success": True, "duplicate": True}
         
-        # Increment campaign replies count
-        await campaign_repo.increment_replies_count(request.campaign_id)
+        # Bump conversation and campaign counters concurrently
+        await asyncio.gather(
+            conv_repo.update_on_reply(request.conversation_id, is_inbound=True),
+            campaign_repo.increment_replies_count(request.campaign_id)
+        )
         
         logger.info(f"Recorded reply from {request.from_email}")
         
-        return {"success": True}
+        return {"success": True, "duplicate": False}
         
     except Exception as e:
         logger.error(f"Error recording reply: {str(e)}")
@@ -263,10 +296,10 @@ class RecordAutoReplyRequest(BaseModel):
 async def record_auto_reply(request: RecordAutoReplyRequest):
     """Record an auto-reply that was sent"""
     try:
-        conv_repo = await get_conversation_repository()
+        conv_repo = get_conversation_repository()
         
-        # Add message to conversation
-        await conv_repo.add_message(
+        # Store message first; the unique gmail_message_id index rejects replays
+        message = await conv_repo.add_message(
             conversation_id=request.conversation_id,
             campaign_id=request.campaign_id,
             direction="outbound",
@@ -279,12 +312,15 @@ async def record_auto_reply(request: RecordAutoReplyRequest):
             sent_at=datetime.utcnow()
         )
         
-        # Increment auto-reply count
+        if message is None:
+            logger.info(f"Auto-reply {request.gmail_message_id} already recorded, skipping")
+            return {"success": True, "duplicate": True}
+        
         await conv_repo.increment_auto_replies(request.conversation_id)
         
         logger.info(f"Recorded auto-reply to {request.to_email}")
         
-        return {"success": True}
+        return {"success": True, "duplicate": False}
         
     except Exception as e:
         logger.error(f"Error recording auto-reply: {str(e)}")
@@ -297,9 +333,13 @@ async def get_users_with_auto_reply():
     Get all users that have campaigns with auto-reply enabled
     Returns user IDs with their Gmail tokens for scheduled task
     """
+    cached = users_with_auto_reply_cache.get(USERS_WITH_AUTO_REPLY_KEY)
+    if cached is not None:
+        return cached
+    
     try:
-        campaign_repo = await get_campaign_repository()
-        token_repo = await get_provider_token_repository()
+        campaign_repo = get_campaign_repository()
+        token_repo = get_provider_token_repository()
         
         # Get all campaigns with auto-reply enabled
         campaigns = await campaign_repo.get_all_auto_reply_campaigns()
@@ -307,52 +347,56 @@ async def get_users_with_auto_reply():
         # Get unique user IDs
         user_ids = list(set(c.user_id for c in campaigns))
         
-        # Fetch tokens for each user
+        # Fetch tokens for all users in one query
+        tokens = await token_repo.get_by_users_and_provider(user_ids, "google") if user_ids else []
+        
         users_with_tokens = []
-        for user_id in user_ids:
-            token = await token_repo.get_by_user_and_provider(user_id, "google")
-            if token:
-                users_with_tokens.append({
-                    "user_id": user_id,
-                    "access_token": token.access_token,
-                    "refresh_token": token.refresh_token,
-                    "token_expiry": token.expiry.isoformat() if token.expiry else None
-                })
+        for token in tokens:
+            users_with_tokens.append({
+                "user_id": token.user_id,
+                "access_token": token.access_token,
+                "refresh_token": token.refresh_token,
+                "token_expiry": token.expiry.isoformat() if token.expiry else None
+            })
         
-        return {"users": users_with_tokens}
+        response = {"users": users_with_tokens}
+        users_with_auto_reply_cache.set(USERS_WITH_AUTO_REPLY_KEY, response)
+        return response
         
     except Exception as e:
         logger.error(f"Error fetching users with auto-reply: {str(e)}")
         return {"users": []}
 
 
+async def _stream_messages_json(messages: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    """Encode messages as {"messages": [...]} one row at a time"""
+    yield b'{"messages":['
+    try:
+        first = True
+        async for message in messages:
+            if not first:
+                yield b","
+            yield orjson.dumps(message)
+            first = False
+    except Exception as e:
+        # Headers are already sent; log and still close the JSON document
+        logger.error(f"Error fetching conversation history: {str(e)}")
+    yield b"]}"
+
+
 @router.get("/conversation-history/{conversation_id}")
 async def get_conversation_history(conversation_id: str):
     """
     Get conversation history for AI context
     Returns messages in chronological order
     """
-    try:
-        conv_repo = await get_conversation_repository()
-        
-        messages = await conv_repo.get_messages(conversation_id)
-        
-        return {
-            "messages": [
-                {
-                    "direction": msg.direction,
-                    "subject": msg.subject,
-                    "body": msg.body[:500] if msg.body else "",  # Truncate for context
-                    "is_auto_reply": msg.is_auto_reply,
-                    "sent_at": msg.sent_at.isoformat() if msg.sent_at else None
-                }
-                for msg in messages
-            ]
-        }
-        
-    except Exception as e:
-        logger.error(f"Error fetching conversation history: {str(e)}")
-        return {"messages": []}
+    conv_repo = get_conversation_repository()
+    
+    # Bodies are truncated to 500 chars in the query and rows are streamed
+    # straight from the cursor, so long threads never sit in memory as a list
+    messages = conv_repo.iter_messages_for_context(conversation_id, body_chars=500)
+    
+    return StreamingResponse(_stream_messages_json(messages), media_type="application/json")
 
 
 @router.get("/calendar-availability/{user_id}")
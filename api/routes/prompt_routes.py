@@ -1,13 +1,23 @@
-from fastapi import APIRouter, Header, HTTPException, Query
-from typing import Optional, List
-from pydantic import BaseModel
-from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from typing import AsyncIterator, Optional, List
+from pydantic import BaseModel, ConfigDict
+from datetime import datetime, timedelta, timezone
+import asyncio
 import os
+from functools import lru_cache
 import json
+import hashlib
+import orjson
 import httpx
-from db.repository_factory import get_prompt_repository
+from core.interfaces.repositories import PromptRepository
 from db.mongodb.calendar_repository import MongoCalendarRepository
 from integrations.calcom_client import CalComClient
+from integrations.http_client import get_http_client
+from core.campaigns.auto_reply_cache import invalidate_auto_reply_cache
+from api.dependencies.auth import UserId
+from api.dependencies.repositories import prompt_repository
+from utils.cache import TTLCache
 from utils.logger import logger
 from config import settings
 
@@ -33,6 +43,68 @@ Instructions:
 Reply:"""
 
 
+GEMINI_MODEL_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-lite"
+# Parsed once; the API key goes in the x-goog-api-key header so it stays out of URLs and logs
+_GEMINI_GENERATE_URL = httpx.URL(f"{GEMINI_MODEL_URL}:generateContent")
+_GEMINI_STREAM_URL = httpx.URL(f"{GEMINI_MODEL_URL}:streamGenerateContent", params={"alt": "sse"})
+
+
+# Gemini function declarations for the calendar tools
+_CAL_TOOLS = [{
+    "function_declarations": [
+        {
+            "name": "getCalendarAvailability",
+            "description": "Get calendar availability for a specified number of days ahead. Use this when the contact asks about available times.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "daysAhead": {
+                        "type": "integer",
+                        "description": "Number of days to check ahead (default: 14)"
+                    }
+                }
+            }
+        },
+        {
+            "name": "bookMeeting",
+            "description": "Book a meeting slot when the contact agrees to meet. Use contactEmail and contactName from context.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "startTime": {
+                        "type": "string",
+                        "description": "Start time in ISO format"
+                    },
+                    "endTime": {
+                        "type": "string",
+                        "description": "End time in ISO format"
+                    },
+                    "attendeeEmail": {
+                        "type": "string",
+                        "description": "Email address of the attendee"
+                    },
+                    "attendeeName": {
+                        "type": "string",
+                        "description": "Name of the attendee"
+                    },
+                    "notes": {
+                        "type": "string",
+                        "description": "Optional notes about the meeting"
+                    }
+                },
+                "required": ["startTime", "endTime", "attendeeEmail", "attendeeName"]
+            }
+        }
+    ]
+}]
+
+# Shared generation settings for test replies
+_GENERATION_CONFIG = {
+    "maxOutputTokens": 1500,
+    "temperature": 0.7
+}
+
+
 # Request/Response Models
 class CreatePromptRequest(BaseModel):
     """Request to create a new prompt"""
@@ -52,6 +124,9 @@ class UpdatePromptRequest(BaseModel):
 
 class PromptItem(BaseModel):
     """Single prompt item"""
+    # Built straight from the Prompt domain object's attributes
+    model_config = ConfigDict(from_attributes=True)
+
     id: str
     name: str
     description: Optional[str]
@@ -111,34 +186,54 @@ class TestPromptResponse(BaseModel):
     booking_id: Optional[str] = None
 
 
-def get_user_id_from_header(x_user_id: Optional[str] = Header(None)) -> str:
-    """Extract user ID from header"""
-    if not x_user_id:
-        raise HTTPException(status_code=401, detail="User authentication required. Missing X-User-Id header")
-    return x_user_id
+def _prompt_response(prompt) -> Response:
+    """Validate a prompt once and serialize it in pydantic-core, bypassing FastAPI's response_model pass"""
+    body = PromptResponse(prompt=PromptItem.model_validate(prompt)).model_dump_json()
+    return Response(content=body, media_type="application/json")
+
+
+# Cal.com event type resolved for users whose calendar token has none stored
+_event_type_id_cache = TTLCache(ttl=3600)
+
+# (user_id, event_type_id, days_ahead) -> availability tool result; repeated test
+# runs within the TTL skip the cal.com round trip, bookings invalidate the user's entries
+_availability_cache = TTLCache(ttl=90)
+
+
+# The system default never changes, so it is serialized once at import
+_SYSTEM_DEFAULT_JSON = SystemDefaultResponse(
+    prompt_text=SYSTEM_DEFAULT_PROMPT,
+    name="System Default",
+    description="The built-in default prompt used when no custom prompt is selected"
+).model_dump_json().encode()
+_SYSTEM_DEFAULT_ETAG = f'"{hashlib.sha256(_SYSTEM_DEFAULT_JSON).hexdigest()[:16]}"'
+# Content only changes with a deploy, and the ETag changes with it
+_SYSTEM_DEFAULT_HEADERS = {
+    "Cache-Control": "public, max-age=86400",
+    "ETag": _SYSTEM_DEFAULT_ETAG
+}
 
 
 @router.get("/system-default", response_model=SystemDefaultResponse)
-async def get_system_default_prompt():
+async def get_system_default_prompt(if_none_match: Optional[str] = Header(None)):
     """Get the system default prompt (for reference)"""
-    return SystemDefaultResponse(
-        prompt_text=SYSTEM_DEFAULT_PROMPT,
-        name="System Default",
-        description="The built-in default prompt used when no custom prompt is selected"
+    if if_none_match == _SYSTEM_DEFAULT_ETAG:
+        return Response(status_code=304, headers=_SYSTEM_DEFAULT_HEADERS)
+    return Response(
+        content=_SYSTEM_DEFAULT_JSON,
+        media_type="application/json",
+        headers=_SYSTEM_DEFAULT_HEADERS
     )
 
 
 @router.post("", response_model=PromptResponse)
 async def create_prompt(
     request: CreatePromptRequest,
-    x_user_id: Optional[str] = Header(None)
+    user_id: UserId,
+    prompt_repo: PromptRepository = Depends(prompt_repository)
 ):
     """Create a new AI prompt"""
-    user_id = get_user_id_from_header(x_user_id)
-
     try:
-        prompt_repo = await get_prompt_repository()
-
         prompt = await prompt_repo.create_prompt(
             user_id=user_id,
             name=request.name,
@@ -147,18 +242,7 @@ async def create_prompt(
             is_default=request.is_default
         )
 
-        return PromptResponse(
-            prompt=PromptItem(
-                id=prompt.id,
-                name=prompt.name,
-                description=prompt.description,
-                prompt_text=prompt.prompt_text,
-                is_default=prompt.is_default,
-                is_active=prompt.is_active,
-                created_at=prompt.created_at,
-                updated_at=prompt.updated_at
-            )
-        )
+        return _prompt_response(prompt)
 
     except Exception as e:
         logger.error(f"Error creating prompt: {str(e)}")
@@ -167,40 +251,38 @@ async def create_prompt(
 
 @router.get("", response_model=PromptListResponse)
 async def list_prompts(
-    x_user_id: Optional[str] = Header(None),
+    user_id: UserId,
     page: int = Query(1, ge=1),
-    page_size: int = Query(50, ge=1, le=100)
+    page_size: int = Query(50, ge=1, le=100),
+    prompt_repo: PromptRepository = Depends(prompt_repository)
 ):
     """List user's AI prompts"""
-    user_id = get_user_id_from_header(x_user_id)
-
     try:
-        prompt_repo = await get_prompt_repository()
-
         skip = (page - 1) * page_size
-        prompts = await prompt_repo.get_by_user(user_id, skip=skip, limit=page_size)
-        total = await prompt_repo.count_by_user(user_id)
+        prompts, total = await prompt_repo.get_page_and_count(user_id, skip=skip, limit=page_size)
 
+        # Rows come straight from our own DB, so skip per-item pydantic validation and
+        # hand plain dicts to orjson (returning a Response bypasses response_model checks)
         prompt_items = [
-            PromptItem(
-                id=p.id,
-                name=p.name,
-                description=p.description,
-                prompt_text=p.prompt_text,
-                is_default=p.is_default,
-                is_active=p.is_active,
-                created_at=p.created_at,
-                updated_at=p.updated_at
-            )
+            {
+                "id": p.id,
+                "name": p.name,
+                "description": p.description,
+                "prompt_text": p.prompt_text,
+                "is_default": p.is_default,
+                "is_active": p.is_active,
+                "created_at": p.created_at,
+                "updated_at": p.updated_at
+            }
             for p in prompts
         ]
 
-        return PromptListResponse(
-            prompts=prompt_items,
-            total=total,
-            page=page,
-            page_size=page_size
-        )
+        return ORJSONResponse({
+            "prompts": prompt_items,
+            "total": total,
+            "page": page,
+            "page_size": page_size
+        })
 
     except Exception as e:
         logger.error(f"Error listing prompts: {str(e)}")
@@ -210,13 +292,11 @@ async def list_prompts(
 @router.get("/{prompt_id}", response_model=PromptResponse)
 async def get_prompt(
     prompt_id: str,
-    x_user_id: Optional[str] = Header(None)
+    user_id: UserId,
+    prompt_repo: PromptRepository = Depends(prompt_repository)
 ):
     """Get a specific prompt by ID"""
-    user_id = get_user_id_from_header(x_user_id)
-
     try:
-        prompt_repo = await get_prompt_repository()
         prompt = await prompt_repo.get_by_id(prompt_id)
 
         if not prompt:
@@ -225,18 +305,7 @@ async def get_prompt(
         if prompt.user_id != user_id:
             raise HTTPException(status_code=403, detail="Access denied to prompt")
 
-        return PromptResponse(
-            prompt=PromptItem(
-                id=prompt.id,
-                name=prompt.name,
-                description=prompt.description,
-                prompt_text=prompt.prompt_text,
-                is_default=prompt.is_default,
-                is_active=prompt.is_active,
-                created_at=prompt.created_at,
-                updated_at=prompt.updated_at
-            )
-        )
+        return _prompt_response(prompt)
 
     except HTTPException:
         raise
@@ -249,44 +318,28 @@ async def get_prompt(
 async def update_prompt(
     prompt_id: str,
     request: UpdatePromptRequest,
-    x_user_id: Optional[str] = Header(None)
+    user_id: UserId,
+    prompt_repo: PromptRepository = Depends(prompt_repository)
 ):
     """Update an existing prompt"""
-    user_id = get_user_id_from_header(x_user_id)
-
     try:
-        prompt_repo = await get_prompt_repository()
-
-        # Check ownership
-        existing = await prompt_repo.get_by_id(prompt_id)
-        if not existing:
-            raise HTTPException(status_code=404, detail="Prompt not found")
-        if existing.user_id != user_id:
-            raise HTTPException(status_code=403, detail="Access denied to prompt")
-
         prompt = await prompt_repo.update_prompt(
             prompt_id=prompt_id,
             name=request.name,
             description=request.description,
             prompt_text=request.prompt_text,
-            is_default=request.is_default
+            is_default=request.is_default,
+            user_id=user_id
         )
 
+        # Ownership is enforced by the update filter; a miss means not found or not owned
         if not prompt:
-            raise HTTPException(status_code=500, detail="Failed to update prompt")
-
-        return PromptResponse(
-            prompt=PromptItem(
-                id=prompt.id,
-                name=prompt.name,
-                description=prompt.description,
-                prompt_text=prompt.prompt_text,
-                is_default=prompt.is_default,
-                is_active=prompt.is_active,
-                created_at=prompt.created_at,
-                updated_at=prompt.updated_at
-            )
-        )
+            raise HTTPException(status_code=404, detail="Prompt not found")
+
+        # Campaigns referencing this prompt serve its text to the auto-reply scheduler
+        invalidate_auto_reply_cache(user_id)
+
+        return _prompt_response(prompt)
 
     except HTTPException:
         raise
@@ -298,38 +351,17 @@ async def update_prompt(
 @router.post("/{prompt_id}/set-default", response_model=PromptResponse)
 async def set_prompt_as_default(
     prompt_id: str,
-    x_user_id: Optional[str] = Header(None)
+    user_id: UserId,
+    prompt_repo: PromptRepository = Depends(prompt_repository)
 ):
     """Set a prompt as the user's default"""
-    user_id = get_user_id_from_header(x_user_id)
-
     try:
-        prompt_repo = await get_prompt_repository()
-
-        # Check ownership
-        existing = await prompt_repo.get_by_id(prompt_id)
-        if not existing:
-            raise HTTPException(status_code=404, detail="Prompt not found")
-        if existing.user_id != user_id:
-            raise HTTPException(status_code=403, detail="Access denied to prompt")
-
         prompt = await prompt_repo.set_as_default(user_id, prompt_id)
 
         if not prompt:
-            raise HTTPException(status_code=500, detail="Failed to set default prompt")
-
-        return PromptResponse(
-            prompt=PromptItem(
-                id=prompt.id,
-                name=prompt.name,
-                description=prompt.description,
-                prompt_text=prompt.prompt_text,
-                is_default=prompt.is_default,
-                is_active=prompt.is_active,
-                created_at=prompt.created_at,
-                updated_at=prompt.updated_at
-            )
-        )
+            raise HTTPException(status_code=404, detail="Prompt not found")
+
+        return _prompt_response(prompt)
 
     except HTTPException:
         raise
@@ -341,30 +373,21 @@ async def set_prompt_as_default(
 @router.delete("/{prompt_id}", response_model=DeletePromptResponse)
 async def delete_prompt(
     prompt_id: str,
-    x_user_id: Optional[str] = Header(None)
+    user_id: UserId,
+    prompt_repo: PromptRepository = Depends(prompt_repository)
 ):
     """Delete a prompt"""
-    user_id = get_user_id_from_header(x_user_id)
-
     try:
-        prompt_repo = await get_prompt_repository()
-
-        # Check ownership
-        existing = await prompt_repo.get_by_id(prompt_id)
-        if not existing:
-            raise HTTPException(status_code=404, detail="Prompt not found")
-        if existing.user_id != user_id:
-            raise HTTPException(status_code=403, detail="Access denied to prompt")
-
-        success = await prompt_repo.delete_by_id(prompt_id)
+        success = await prompt_repo.delete_by_id(prompt_id, user_id=user_id)
 
         if success:
+            invalidate_auto_reply_cache(user_id)
             return DeletePromptResponse(
                 success=True,
                 message="Prompt deleted successfully"
             )
         else:
-            raise HTTPException(status_code=500, detail="Failed to delete prompt")
+            raise HTTPException(status_code=404, detail="Prompt not found")
 
     except HTTPException:
         raise
@@ -373,54 +396,40 @@ async def delete_prompt(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/test", response_model=TestPromptResponse)
-async def test_prompt(
-    request: TestPromptRequest,
-    x_user_id: Optional[str] = Header(None)
-):
-    """
-    Test a prompt by chatting with the AI directly.
-    Simulates how the AI would respond to an email using the given prompt.
-    Supports calendar tools if enabled.
-    """
-    user_id = get_user_id_from_header(x_user_id)
+@lru_cache(maxsize=1)
+def _get_gemini_api_key() -> Optional[str]:
+    """Get the Gemini API key from settings or environment (for backward compatibility)"""
+    return (
+        settings.google_generative_ai_api_key or
+        os.getenv("GOOGLE_GENERATIVE_AI_API_KEY") or
+        os.getenv("GOOGLE_GEMINI_API_KEY") or
+        os.getenv("GOOGLE_API_KEY")
+    )
 
-    try:
-        # Get API key from settings or environment (for backward compatibility)
-        api_key = (
-            settings.google_generative_ai_api_key or
-            os.getenv("GOOGLE_GENERATIVE_AI_API_KEY") or
-            os.getenv("GOOGLE_GEMINI_API_KEY") or
-            os.getenv("GOOGLE_API_KEY")
-        )
-        
-        if not api_key:
-            return TestPromptResponse(
-                success=False,
-                error="AI API key not configured. Please set GOOGLE_GENERATIVE_AI_API_KEY in your .env file or environment variables."
-            )
 
-        # Build conversation history for context
-        history_text = ""
-        for msg in request.conversation_history[-5:]:  # Last 5 messages
-            direction = "INBOUND" if msg.role == "user" else "OUTBOUND"
-            history_text += f"[{direction}]: {msg.content[:300]}\n\n"
+def _build_test_system_prompt(request: TestPromptRequest) -> str:
+    """Build the prompt sent to Gemini for a simulated test conversation"""
+    # Build conversation history for context
+    history_text = "".join(
+        f"[{'INBOUND' if msg.role == 'user' else 'OUTBOUND'}]: {msg.content[:300]}\n\n"
+        for msg in request.conversation_history[-5:]  # Last 5 messages
+    )
 
-        # Build the system prompt
-        current_date = datetime.utcnow()
-        current_date_str = current_date.strftime("%Y-%m-%d")
-        current_datetime_str = current_date.strftime("%Y-%m-%dT%H:%M:%SZ")
-        
-        calendar_instructions = ""
-        if request.cal_tools_enabled:
-            calendar_instructions = f"""
+    # Build the system prompt
+    now = datetime.now(timezone.utc)
+    current_date_str = now.date().isoformat()
+    
+    calendar_instructions = ""
+    if request.cal_tools_enabled:
+        current_datetime_str = now.replace(microsecond=0, tzinfo=None).isoformat() + "Z"
+        calendar_instructions = f"""
 
 IMPORTANT - CURRENT DATE/TIME: {current_datetime_str}
 When booking meetings, ONLY use times from the getCalendarAvailability tool results.
 These are the ONLY valid future time slots. Do NOT make up times.
 Remember: When they agree to meet, book immediately using contactEmail and contactName above."""
-        
-        system_prompt = f"""{request.prompt_text}
+    
+    system_prompt = f"""{request.prompt_text}
 
 CONTACT INFORMATION (USE THESE - DO NOT ASK):
 - Contact Email: test@example.com
@@ -436,71 +445,48 @@ Previous conversation:
 Latest email from Test User (test@example.com):
 Subject: Test Conversation
 Message: {request.user_message}{calendar_instructions}"""
+    return system_prompt
 
-        # Define tools if calendar is enabled
-        tools = None
-        if request.cal_tools_enabled:
-            tools = [{
-                "function_declarations": [
-                    {
-                        "name": "getCalendarAvailability",
-                        "description": "Get calendar availability for a specified number of days ahead. Use this when the contact asks about available times.",
-                        "parameters": {
-                            "type": "object",
-                            "properties": {
-                                "daysAhead": {
-                                    "type": "integer",
-                                    "description": "Number of days to check ahead (default: 14)"
-                                }
-                            }
-                        }
-                    },
-                    {
-                        "name": "bookMeeting",
-                        "description": "Book a meeting slot when the contact agrees to meet. Use contactEmail and contactName from context.",
-                        "parameters": {
-                            "type": "object",
-                            "properties": {
-                                "startTime": {
-                                    "type": "string",
-                                    "description": "Start time in ISO format"
-                                },
-                                "endTime": {
-                                    "type": "string",
-                                    "description": "End time in ISO format"
-                                },
-                                "attendeeEmail": {
-                                    "type": "string",
-                                    "description": "Email address of the attendee"
-                                },
-                                "attendeeName": {
-                                    "type": "string",
-                                    "description": "Name of the attendee"
-                                },
-                                "notes": {
-                                    "type": "string",
-                                    "description": "Optional notes about the meeting"
-                                }
-                            },
-                            "required": ["startTime", "endTime", "attendeeEmail", "attendeeName"]
-                        }
-                    }
-                ]
-            }]
 
-        # Build request payload
-        gemini_payload = {
-            "contents": [
-                {
-                    "role": "user",
-                    "parts": [{"text": f"{system_prompt}\n\nGenerate a professional reply to the latest email."}]
-                }
-            ],
-            "generationConfig": {
-                "maxOutputTokens": 1500,
-                "temperature": 0.7
+def _build_gemini_payload(system_prompt: str) -> dict:
+    """Build the Gemini request body for a test reply"""
+    return {
+        "contents": [
+            {
+                "role": "user",
+                "parts": [{"text": f"{system_prompt}\n\nGenerate a professional reply to the latest email."}]
             }
-        }
+        ],
+        "generationConfig": _GENERATION_CONFIG
+    }
+
+
+@router.post("/test", response_model=TestPromptResponse)
+async def test_prompt(
+    request: TestPromptRequest,
+    user_id: UserId
+):
+    """
+    Test a prompt by chatting with the AI directly.
+    Simulates how the AI would respond to an email using the given prompt.
+    Supports calendar tools if enabled.
+    """
+    try:
+        api_key = _get_gemini_api_key()
+        
+        if not api_key:
+            return TestPromptResponse(
+                success=False,
+                error="AI API key not configured. Please set GOOGLE_GENERATIVE_AI_API_KEY in your .env file or environment variables."
+            )
+
+        system_prompt = _build_test_system_prompt(request)
+
+        # Calendar tools are only offered when enabled
+        tools = _CAL_TOOLS if request.cal_tools_enabled else None
+
+        # Build request payload
+        gemini_payload = _build_gemini_payload(system_prompt)
         
         if tools:
             gemini_payload["tools"] = tools
@@ -509,88 +495,91 @@ Message: {request.user_message}{calendar_instructions}"""
         booking_id = None
         max_iterations = 3
 
-        async with httpx.AsyncClient() as client:
-            for iteration in range(max_iterations):
-                response = await client.post(
-                    f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-lite:generateContent?key={api_key}",
-                    json=gemini_payload,
-                    timeout=60.0
-                )
+        client = get_http_client()
+        for iteration in range(max_iterations):
+            response = await client.post(
+                _GEMINI_GENERATE_URL,
+                content=orjson.dumps(gemini_payload),
+                headers={"Content-Type": "application/json", "x-goog-api-key": api_key},
+                timeout=60.0
+            )
 
-                if response.status_code != 200:
-                    error_text = response.text
-                    logger.error(f"Gemini API error: {response.status_code} - {error_text}")
-                    return TestPromptResponse(
-                        success=False,
-                        error=f"AI API error: {response.status_code}"
-                    )
+            if response.status_code != 200:
+                error_text = response.text
+                logger.error(f"Gemini API error: {response.status_code} - {error_text}")
+                return TestPromptResponse(
+                    success=False,
+                    error=f"AI API error: {response.status_code}"
+                )
 
-                data = response.json()
-                candidates = data.get("candidates", [])
-                
-                if not candidates:
-                    return TestPromptResponse(
-                        success=False,
-                        error="No response from AI"
-                    )
-                
-                content = candidates[0].get("content", {})
-                parts = content.get("parts", [])
-                
-                if not parts:
-                    return TestPromptResponse(
-                        success=False,
-                        error="Empty response from AI"
-                    )
+            data = orjson.loads(response.content)
+            candidates = data.get("candidates", [])
+            
+            if not candidates:
+                return TestPromptResponse(
+                    success=False,
+                    error="No response from AI"
+                )
+            
+            content = candidates[0].get("content", {})
+            parts = content.get("parts", [])
+            
+            if not parts:
+                return TestPromptResponse(
+                    success=False,
+                    error="Empty response from AI"
+                )
+            
+            # Check for function calls (the model may request several in one turn)
+            function_calls = [p["functionCall"] for p in parts if p.get("functionCall")]
+            
+            if function_calls and request.cal_tools_enabled:
+                for function_call in function_calls:
+                    logger.info(f"AI called function: {function_call.get('name')} with args: {function_call.get('args', {})}")
                 
-                # Check for function calls
-                function_call = parts[0].get("functionCall")
+                # Execute the functions concurrently
+                function_results = await asyncio.gather(*(
+                    execute_calendar_function(user_id, fc.get("name"), fc.get("args", {}))
+                    for fc in function_calls
+                ))
                 
-                if function_call and request.cal_tools_enabled:
-                    # Execute the function
-                    func_name = function_call.get("name")
-                    func_args = function_call.get("args", {})
-                    
-                    logger.info(f"AI called function: {func_name} with args: {func_args}")
-                    
-                    function_result = await execute_calendar_function(user_id, func_name, func_args)
-                    
-                    # Check if booking was successful
-                    if func_name == "bookMeeting" and function_result.get("success"):
+                # Check if booking was successful
+                for function_call, function_result in zip(function_calls, function_results):
+                    if function_call.get("name") == "bookMeeting" and function_result.get("success"):
                         booking_url = function_result.get("booking_url")
                         booking_id = function_result.get("booking_id")
-                    
-                    # Add function result to conversation and continue
-                    gemini_payload["contents"].append({
-                        "role": "model",
-                        "parts": [{"functionCall": function_call}]
-                    })
-                    gemini_payload["contents"].append({
-                        "role": "user",
-                        "parts": [{"functionResponse": {
-                            "name": func_name,
-                            "response": function_result
-                        }}]
-                    })
-                    
-                    # Continue to next iteration to get final response
-                    continue
                 
-                # Got a text response
-                ai_response = parts[0].get("text", "")
+                # Add all calls and their results to the conversation and continue
+                gemini_payload["contents"].append({
+                    "role": "model",
+                    "parts": [{"functionCall": fc} for fc in function_calls]
+                })
+                gemini_payload["contents"].append({
+                    "role": "user",
+                    "parts": [
+                        {"functionResponse": {"name": fc.get("name"), "response": result}}
+                        for fc, result in zip(function_calls, function_results)
+                    ]
+                })
                 
-                return TestPromptResponse(
-                    success=True,
-                    ai_response=ai_response,
-                    booking_url=booking_url,
-                    booking_id=booking_id
-                )
+                # Continue to next iteration to get final response
+                continue
+            
+            # Got a text response
+            ai_response = parts[0].get("text", "")
             
-            # Max iterations reached
             return TestPromptResponse(
-                success=False,
-                error="AI took too many steps to respond"
+                success=True,
+                ai_response=ai_response,
+                booking_url=booking_url,
+                booking_id=booking_id
             )
+        
+        # Max iterations reached
+        return TestPromptResponse(
+            success=False,
+            error="AI took too many steps to respond"
+        )
 
     except httpx.TimeoutException:
         return TestPromptResponse(
@@ -605,6 +594,111 @@ Message: {request.user_message}{calendar_instructions}"""
         )
 
 
+@router.post("/test/stream")
+async def test_prompt_stream(
+    request: TestPromptRequest,
+    user_id: UserId
+):
+    """
+    Test a prompt and stream the AI reply as server-sent events.
+    Each `data:` event carries a text chunk; a final `done` or `error` event ends the stream.
+    Calendar tools need the full round trip, so they are only supported on /test.
+    """
+    if request.cal_tools_enabled:
+        raise HTTPException(
+            status_code=400,
+            detail="Calendar tools are not supported when streaming. Use /prompts/test instead."
+        )
+
+    api_key = _get_gemini_api_key()
+    if not api_key:
+        raise HTTPException(
+            status_code=500,
+            detail="AI API key not configured. Please set GOOGLE_GENERATIVE_AI_API_KEY in your .env file or environment variables."
+        )
+
+    gemini_payload = _build_gemini_payload(_build_test_system_prompt(request))
+
+    return StreamingResponse(
+        _stream_gemini_reply(api_key, gemini_payload),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
+def _sse_event(event: str, data: dict) -> bytes:
+    """Encode a named server-sent event"""
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+
+async def _stream_gemini_reply(api_key: str, gemini_payload: dict) -> AsyncIterator[bytes]:
+    """Relay text chunks from Gemini's SSE stream as they arrive"""
+    try:
+        async with get_http_client().stream(
+            "POST",
+            _GEMINI_STREAM_URL,
+            content=orjson.dumps(gemini_payload),
+            headers={"Content-Type": "application/json", "x-goog-api-key": api_key},
+            timeout=60.0
+        ) as response:
+            if response.status_code != 200:
+                error_text = (await response.aread()).decode(errors="replace")
+                logger.error(f"Gemini API error: {response.status_code} - {error_text}")
+                yield _sse_event("error", {"error": f"AI API error: {response.status_code}"})
+                return
+
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+
+                chunk = orjson.loads(line[5:])
+                candidates = chunk.get("candidates", [])
+                if not candidates:
+                    continue
+
+                for part in candidates[0].get("content", {}).get("parts", []):
+                    text = part.get("text")
+                    if text:
+                        yield b"data: " + orjson.dumps({"text": text}) + b"\n\n"
+
+        yield _sse_event("done", {})
+
+    except httpx.TimeoutException:
+        yield _sse_event("error", {"error": "AI request timed out. Please try again."})
+    except Exception as e:
+        logger.error(f"Error streaming prompt test: {str(e)}")
+        yield _sse_event("error", {"error": str(e)})
+
+
+async def _resolve_event_type_id(
+    user_id: str,
+    token: dict,
+    client: CalComClient,
+    calendar_repo: MongoCalendarRepository
+) -> Optional[int]:
+    """Get the user's Cal.com event type, looking up and saving the first one if none is stored"""
+    event_type_id = token.get("event_type_id") or _event_type_id_cache.get(user_id)
+    if event_type_id:
+        return event_type_id
+
+    event_types = await client.get_event_types()
+    if not event_types:
+        return None
+
+    first_type = event_types[0]
+    event_type_id = first_type.get("id")
+    _event_type_id_cache.set(user_id, event_type_id)
+
+    # Save on the token so later calls (and other workers) skip the lookup
+    await calendar_repo.update_event_type(
+        user_id=user_id,
+        event_type_id=event_type_id,
+        event_type_slug=first_type.get("slug") or first_type.get("slugPath"),
+        event_type_name=first_type.get("title") or first_type.get("name")
+    )
+    return event_type_id
+
+
 async def execute_calendar_function(user_id: str, func_name: str, args: dict) -> dict:
     """Execute a calendar function and return the result"""
     try:
@@ -621,11 +715,12 @@ async def execute_calendar_function(user_id: str, func_name: str, args: dict) ->
             start_date = datetime.utcnow()
             end_date = start_date + timedelta(days=days_ahead)
             
-            event_type_id = token.get("event_type_id")
-            if not event_type_id:
-                event_types = await client.get_event_types()
-                if event_types:
-                    event_type_id = event_types[0].get("id")
+            event_type_id = await _resolve_event_type_id(user_id, token, client, calendar_repo)
+            
+            cache_key = (user_id, event_type_id, days_ahead)
+            cached = _availability_cache.get(cache_key)
+            if cached is not None:
+                return cached
             
             slots = await client.get_availability(
                 event_type_id=event_type_id,
@@ -634,45 +729,43 @@ async def execute_calendar_function(user_id: str, func_name: str, args: dict) ->
                 timezone="UTC"
             )
             
-            # Group slots by date to show variety across days
+            # Take up to 3 slots per day across up to 10 days, max 20 total, to show
+            # variety across days. Cal.com returns slots in chronological order, so a
+            # single pass that stops at the caps picks the same slots as sorting by date.
             formatted_slots = []
-            slots_by_date = {}
+            slots_per_day = {}
             for slot in slots:
                 start_raw = slot.get("start") or slot.get("time")
-                if start_raw:
-                    date_key = start_raw[:10]  # YYYY-MM-DD
-                    if date_key not in slots_by_date:
-                        slots_by_date[date_key] = []
-                    slots_by_date[date_key].append({
-                        "start": start_raw,
-                        "end": slot.get("end") or slot.get("endTime"),
-                    })
-            
-            # Take up to 3 slots per day, max 20 total slots across multiple days
-            for date_key in sorted(slots_by_date.keys())[:10]:  # Up to 10 different days
-                for slot in slots_by_date[date_key][:3]:  # Up to 3 slots per day
-                    formatted_slots.append(slot)
-                    if len(formatted_slots) >= 20:
-                        break
+                if not start_raw:
+                    continue
+                date_key = start_raw[:10]  # YYYY-MM-DD
+                day_count = slots_per_day.get(date_key, 0)
+                if day_count >= 3:
+                    continue
+                if day_count == 0 and len(slots_per_day) >= 10:
+                    continue
+                slots_per_day[date_key] = day_count + 1
+                formatted_slots.append({
+                    "start": start_raw,
+                    "end": slot.get("end") or slot.get("endTime"),
+                })
                 if len(formatted_slots) >= 20:
                     break
             
             username = token.get("username")
             event_slug = token.get("event_type_slug")
             
-            return {
+            result = {
                 "connected": True,
                 "available_slots": formatted_slots,
                 "booking_link": f"https://cal.com/{username}/{event_slug}" if event_slug else None,
                 "event_type_name": token.get("event_type_name")
             }
+            _availability_cache.set(cache_key, result)
+            return result
         
         elif func_name == "bookMeeting":
-            event_type_id = token.get("event_type_id")
-            if not event_type_id:
-                event_types = await client.get_event_types()
-                if event_types:
-                    event_type_id = event_types[0].get("id")
+            event_type_id = await _resolve_event_type_id(user_id, token, client, calendar_repo)
             
             start_time = datetime.fromisoformat(args["startTime"].replace("Z", "+00:00"))
             end_time = datetime.fromisoformat(args["endTime"].replace("Z", "+00:00"))
@@ -689,6 +782,9 @@ async def execute_calendar_function(user_id: str, func_name: str, args: dict) ->
             
             booking_data = result.get("data", result)
             
+            # The booked slot is no longer free
+            _availability_cache.pop_where(lambda key: key[0] == user_id)
+            
             return {
                 "success": True,
                 "booking_id": str(booking_data.get("id")) if booking_data.get("id") else None,
@@ -1,25 +1,37 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, Response
 from api.dependencies.providers import PROVIDER_REGISTRY
 from core.auth.models import ConnectedProvider
-from typing import List
+from typing import List, Optional
+import hashlib
+import orjson
 from utils.logger import logger
 
 router = APIRouter()
 
 
+# The registry is fixed at import, so the response is serialized once
+_PROVIDERS_JSON = orjson.dumps(list(PROVIDER_REGISTRY.keys()))
+_PROVIDERS_ETAG = f'"{hashlib.sha256(_PROVIDERS_JSON).hexdigest()[:16]}"'
+_PROVIDERS_HEADERS = {
+    "Cache-Control": "public, max-age=3600",
+    "ETag": _PROVIDERS_ETAG
+}
+
+
 @router.get("/providers", response_model=List[str])
-async def list_providers():
+async def list_providers(if_none_match: Optional[str] = Header(None)):
     """
     List all available OAuth providers.
 
     Returns a list of provider names that are configured.
     """
-    try:
-        providers = list(PROVIDER_REGISTRY.keys())
-        return providers
-    except Exception as e:
-        logger.error(f"Failed to list providers: {e}")
-        raise HTTPException(status_code=500, detail="Internal server error")
+    if if_none_match == _PROVIDERS_ETAG:
+        return Response(status_code=304, headers=_PROVIDERS_HEADERS)
+    return Response(
+        content=_PROVIDERS_JSON,
+        media_type="application/json",
+        headers=_PROVIDERS_HEADERS
+    )
 
 
 # TODO: In Phase 2, add endpoint to list connected providers for authenticated user
@@ -1,5 +1,8 @@
-from fastapi import APIRouter, Header, HTTPException
-from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from typing import AsyncIterator, NoReturn
+import asyncio
+import orjson
 from core.templates.models import (
     CreateTemplateRequest,
     UpdateTemplateRequest,
@@ -10,29 +13,37 @@ from core.templates.models import (
     TemplatePreviewResponse,
     TemplateItem
 )
-from core.templates.template_service import TemplateService
-from db.repository_factory import get_template_repository
+from core.templates.template_service import DEFAULT_SAMPLE_DATA, TemplateService
+from core.templates.template_cache import invalidate_template_cache
+from core.interfaces.repositories import Template, TemplateRepository
+from api.dependencies.auth import UserId
+from api.dependencies.repositories import template_repository
+from utils.cache import TTLCache
 from utils.logger import logger
 
 
 router = APIRouter(prefix="/templates")
 
+# Per-user template totals; pagination issues several list calls in a row
+_template_count_cache = TTLCache(ttl=10)
 
-def get_user_id_from_header(x_user_id: Optional[str] = Header(None)) -> str:
-    """Extract user ID from header"""
-    if not x_user_id:
-        raise HTTPException(status_code=401, detail="User authentication required. Missing X-User-Id header")
-    return x_user_id
+
+async def _count_templates(template_repo: TemplateRepository, user_id: str) -> int:
+    """Count a user's templates, reusing a recent count when available"""
+    total = _template_count_cache.get(user_id)
+    if total is None:
+        total = await template_repo.count_by_user(user_id)
+        _template_count_cache.set(user_id, total)
+    return total
 
 
 @router.post("", response_model=TemplateResponse)
 async def create_template(
     request: CreateTemplateRequest,
-    x_user_id: Optional[str] = Header(None)
+    user_id: UserId,
+    template_repo: TemplateRepository = Depends(template_repository)
 ):
     """Create a new email template"""
-    user_id = get_user_id_from_header(x_user_id)
-    
     try:
         # Validate template
         is_valid, errors = TemplateService.validate_template(request.subject, request.body)
@@ -43,7 +54,6 @@ async def create_template(
         variables = TemplateService.extract_template_variables(request.subject, request.body)
         
         # Create template
-        template_repo = await get_template_repository()
         template = await template_repo.create_template(
             user_id=user_id,
             name=request.name,
@@ -51,17 +61,9 @@ async def create_template(
             body=request.body,
             variables=variables
         )
+        _template_count_cache.pop(user_id)
         
-        template_item = TemplateItem(
-            id=template.id,
-            name=template.name,
-            subject=template.subject,
-            body=template.body,
-            variables=template.variables,
-            is_active=template.is_active,
-            created_at=template.created_at,
-            updated_at=template.updated_at
-        )
+        template_item = TemplateItem.from_db(template)
         
         return TemplateResponse(
             success=True,
@@ -78,60 +80,95 @@ async def create_template(
 
 @router.get("", response_model=TemplateListResponse)
 async def list_templates(
-    x_user_id: Optional[str] = Header(None),
+    user_id: UserId,
     page: int = 1,
-    page_size: int = 50
+    page_size: int = 50,
+    include_body: bool = True,
+    template_repo: TemplateRepository = Depends(template_repository)
 ):
-    """List user's templates"""
-    user_id = get_user_id_from_header(x_user_id)
-    
+    """List user's templates (pass include_body=false to omit bodies from the page)"""
     try:
-        template_repo = await get_template_repository()
-        
         # Calculate pagination
         skip = (page - 1) * page_size
         
-        # Get templates
-        templates = await template_repo.get_by_user(user_id, skip=skip, limit=page_size)
-        total = await template_repo.count_by_user(user_id)
+        # Get the page and the total concurrently
+        templates, total = await asyncio.gather(
+            template_repo.get_by_user(user_id, skip=skip, limit=page_size, include_body=include_body),
+            _count_templates(template_repo, user_id)
+        )
         
-        # Convert to response models
+        # Rows come straight from our own DB, so skip per-item pydantic validation and
+        # hand plain dicts to orjson (returning a Response bypasses response_model checks)
         template_items = [
-            TemplateItem(
-                id=t.id,
-                name=t.name,
-                subject=t.subject,
-                body=t.body,
-                variables=t.variables,
-                is_active=t.is_active,
-                created_at=t.created_at,
-                updated_at=t.updated_at
-            )
+            {
+                "id": t.id,
+                "name": t.name,
+                "subject": t.subject,
+                "body": t.body,
+                "variables": t.variables,
+                "is_active": t.is_active,
+                "created_at": t.created_at,
+                "updated_at": t.updated_at
+            }
             for t in templates
         ]
         
-        return TemplateListResponse(
-            templates=template_items,
-            total=total,
-            page=page,
-            page_size=page_size
-        )
+        return ORJSONResponse({
+            "templates": template_items,
+            "total": total,
+            "page": page,
+            "page_size": page_size
+        })
         
     except Exception as e:
         logger.error(f"Error listing templates: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _stream_templates_json(templates: AsyncIterator[Template]) -> AsyncIterator[bytes]:
+    """Encode templates as {"templates": [...], "total": n} one row at a time"""
+    yield b'{"templates":['
+    total = 0
+    try:
+        async for t in templates:
+            if total:
+                yield b","
+            yield orjson.dumps({
+                "id": t.id,
+                "name": t.name,
+                "subject": t.subject,
+                "body": t.body,
+                "variables": t.variables,
+                "is_active": t.is_active,
+                "created_at": t.created_at,
+                "updated_at": t.updated_at
+            })
+            total += 1
+    except Exception as e:
+        # Headers are already sent; log and still close the JSON document
+        logger.error(f"Error streaming templates: {str(e)}")
+    yield b'],"total":' + str(total).encode() + b"}"
+
+
+@router.get("/stream")
+async def stream_templates(
+    user_id: UserId,
+    include_body: bool = True,
+    template_repo: TemplateRepository = Depends(template_repository)
+):
+    """Stream all of the user's templates as one JSON document (for large libraries)"""
+    templates = template_repo.iter_by_user(user_id, include_body=include_body)
+    return StreamingResponse(_stream_templates_json(templates), media_type="application/json")
+
+
 @router.get("/{template_id}", response_model=TemplateResponse)
 async def get_template(
     template_id: str,
-    x_user_id: Optional[str] = Header(None)
+    user_id: UserId,
+    template_repo: TemplateRepository = Depends(template_repository)
 ):
     """Get a single template by ID"""
-    user_id = get_user_id_from_header(x_user_id)
-    
     try:
-        template_repo = await get_template_repository()
         template = await template_repo.get_by_id(template_id)
         
         if not template:
@@ -141,16 +178,7 @@ async def get_template(
         if template.user_id != user_id:
             raise HTTPException(status_code=403, detail="Access denied")
         
-        template_item = TemplateItem(
-            id=template.id,
-            name=template.name,
-            subject=template.subject,
-            body=template.body,
-            variables=template.variables,
-            is_active=template.is_active,
-            created_at=template.created_at,
-            updated_at=template.updated_at
-        )
+        template_item = TemplateItem.from_db(template)
         
         return TemplateResponse(
             success=True,
@@ -165,58 +193,59 @@ async def get_template(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _raise_template_miss(template_repo: TemplateRepository, template_id: str) -> NoReturn:
+    """Raise 404 or 403 after an owner-filtered write matched nothing"""
+    owner = await template_repo.get_owner(template_id)
+    if owner is None:
+        raise HTTPException(status_code=404, detail="Template not found")
+    raise HTTPException(status_code=403, detail="Access denied")
+
+
 @router.put("/{template_id}", response_model=TemplateResponse)
 async def update_template(
     template_id: str,
     request: UpdateTemplateRequest,
-    x_user_id: Optional[str] = Header(None)
+    user_id: UserId,
+    template_repo: TemplateRepository = Depends(template_repository)
 ):
     """Update an existing template"""
-    user_id = get_user_id_from_header(x_user_id)
-    
     try:
-        template_repo = await get_template_repository()
-        
-        # Check if template exists and user owns it
-        existing = await template_repo.get_by_id(template_id)
-        if not existing:
-            raise HTTPException(status_code=404, detail="Template not found")
-        if existing.user_id != user_id:
-            raise HTTPException(status_code=403, detail="Access denied")
-        
-        # Validate if subject or body is being updated
-        subject = request.subject if request.subject is not None else existing.subject
-        body = request.body if request.body is not None else existing.body
-        
-        is_valid, errors = TemplateService.validate_template(subject, body)
-        if not is_valid:
-            raise HTTPException(status_code=400, detail=f"Invalid template: {'; '.join(errors)}")
-        
-        # Extract variables if subject or body changed
         variables = None
         if request.subject is not None or request.body is not None:
+            subject, body = request.subject, request.body
+
+            # Variables span subject and body, so a partial edit needs the stored other half
+            if subject is None or body is None:
+                existing = await template_repo.get_by_id(template_id)
+                if not existing:
+                    raise HTTPException(status_code=404, detail="Template not found")
+                if existing.user_id != user_id:
+                    raise HTTPException(status_code=403, detail="Access denied")
+                subject = subject if subject is not None else existing.subject
+                body = body if body is not None else existing.body
+
+            is_valid, errors = TemplateService.validate_template(subject, body)
+            if not is_valid:
+                raise HTTPException(status_code=400, detail=f"Invalid template: {'; '.join(errors)}")
+
             variables = TemplateService.extract_template_variables(subject, body)
         
-        # Update template
+        # Update template; the user_id filter doubles as the ownership check
         template = await template_repo.update_template(
             template_id=template_id,
             name=request.name,
             subject=request.subject,
             body=request.body,
             variables=variables,
-            is_active=request.is_active
+            is_active=request.is_active,
+            user_id=user_id
         )
+
+        if not template:
+            await _raise_template_miss(template_repo, template_id)
+        invalidate_template_cache(template_id)
         
-        template_item = TemplateItem(
-            id=template.id,
-            name=template.name,
-            subject=template.subject,
-            body=template.body,
-            variables=template.variables,
-            is_active=template.is_active,
-            created_at=template.created_at,
-            updated_at=template.updated_at
-        )
+        template_item = TemplateItem.from_db(template)
         
         return TemplateResponse(
             success=True,
@@ -234,31 +263,23 @@ async def update_template(
 @router.delete("/{template_id}", response_model=DeleteTemplateResponse)
 async def delete_template(
     template_id: str,
-    x_user_id: Optional[str] = Header(None)
+    user_id: UserId,
+    template_repo: TemplateRepository = Depends(template_repository)
 ):
     """Delete a template"""
-    user_id = get_user_id_from_header(x_user_id)
-    
     try:
-        template_repo = await get_template_repository()
-        
-        # Check if template exists and user owns it
-        existing = await template_repo.get_by_id(template_id)
-        if not existing:
-            raise HTTPException(status_code=404, detail="Template not found")
-        if existing.user_id != user_id:
-            raise HTTPException(status_code=403, detail="Access denied")
-        
-        # Delete template
-        success = await template_repo.delete_by_id(template_id)
+        # Delete template; the user_id filter doubles as the ownership check
+        success = await template_repo.delete_by_id(template_id, user_id=user_id)
         
         if success:
+            _template_count_cache.pop(user_id)
+            invalidate_template_cache(template_id)
             return DeleteTemplateResponse(
                 success=True,
                 message="Template deleted successfully"
             )
         else:
-            raise HTTPException(status_code=404, detail="Template not found")
+            await _raise_template_miss(template_repo, template_id)
             
     except HTTPException:
         raise
@@ -271,13 +292,11 @@ async def delete_template(
 async def preview_template(
     template_id: str,
     request: TemplatePreviewRequest,
-    x_user_id: Optional[str] = Header(None)
+    user_id: UserId,
+    template_repo: TemplateRepository = Depends(template_repository)
 ):
     """Preview template with sample data"""
-    user_id = get_user_id_from_header(x_user_id)
-    
     try:
-        template_repo = await get_template_repository()
         template = await template_repo.get_by_id(template_id)
         
         if not template:
@@ -285,16 +304,15 @@ async def preview_template(
         if template.user_id != user_id:
             raise HTTPException(status_code=403, detail="Access denied")
         
-        # Generate preview
-        preview = TemplateService.preview_template(
-            template.subject,
-            template.body,
-            request.sample_data
+        # Generate preview; the compiled template is reused until the row changes
+        compiled_subject, compiled_body = TemplateService.compile_stored(
+            template.id, template.updated_at, template.subject, template.body
         )
+        sample_data = request.sample_data if request.sample_data is not None else DEFAULT_SAMPLE_DATA
         
         return TemplatePreviewResponse(
-            subject=preview["subject"],
-            body=preview["body"],
+            subject=compiled_subject.render(sample_data),
+            body=compiled_body.render(sample_data),
             variables=template.variables
         )
         
@@ -1,11 +1,28 @@
-from fastapi import APIRouter, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header
 from typing import Optional
 from pydantic import BaseModel
-from db.repository_factory import get_campaign_repository
+import hmac
+from bson import ObjectId
+from core.interfaces.repositories import CampaignRepository
+from api.dependencies.repositories import campaign_repository
+from core.campaigns.progress_buffer import campaign_progress_buffer
 from utils.logger import logger
+from config import settings
 
 
-router = APIRouter(prefix="/webhooks/trigger")
+# Encoded once; verification is skipped when no secret is configured
+_WEBHOOK_SECRET = settings.trigger_webhook_secret.encode() if settings.trigger_webhook_secret else None
+
+
+async def verify_webhook_secret(x_webhook_secret: Optional[str] = Header(None)) -> None:
+    """Reject webhook calls whose X-Webhook-Secret does not match the configured secret"""
+    if _WEBHOOK_SECRET is None:
+        return
+    if not x_webhook_secret or not hmac.compare_digest(x_webhook_secret.encode(), _WEBHOOK_SECRET):
+        raise HTTPException(status_code=401, detail="Invalid webhook secret")
+
+
+router = APIRouter(prefix="/webhooks/trigger", dependencies=[Depends(verify_webhook_secret)])
 
 
 class CampaignStatusUpdate(BaseModel):
@@ -23,23 +40,29 @@ class CampaignProgressUpdate(BaseModel):
     failed: int
 
 
+# Statuses that end a run; callers need these confirmed before moving on
+FINAL_CAMPAIGN_STATUSES = {"completed", "failed", "cancelled"}
+
+
 @router.post("/campaign-status")
 async def update_campaign_status(
     payload: CampaignStatusUpdate,
-    x_webhook_secret: Optional[str] = Header(None)
+    campaign_repo: CampaignRepository = Depends(campaign_repository)
 ):
     """
     Webhook endpoint for Trigger.dev to update campaign status
     
-    Called when campaign status changes (running, completed, failed, etc.)
+    Called when campaign status changes (running, completed, failed, etc.).
+    A late intermediate status never overwrites a final one.
     """
-    # TODO: Validate webhook secret for security
-    # if x_webhook_secret != settings.TRIGGER_WEBHOOK_SECRET:
-    #     raise HTTPException(status_code=401, detail="Invalid webhook secret")
-    
     try:
-        campaign_repo = await get_campaign_repository()
-        
+        if not ObjectId.is_valid(payload.campaign_id):
+            raise HTTPException(status_code=404, detail="Campaign not found")
+
+        if payload.status in FINAL_CAMPAIGN_STATUSES:
+            # Land any buffered counters before the run is marked finished
+            await campaign_progress_buffer.flush_campaign(payload.campaign_id)
+
         campaign = await campaign_repo.update_status(
             campaign_id=payload.campaign_id,
             status=payload.status,
@@ -47,10 +70,17 @@ async def update_campaign_status(
         )
         
         if not campaign:
-            logger.warning(f"Campaign {payload.campaign_id} not found for status update")
-            raise HTTPException(status_code=404, detail="Campaign not found")
-        
-        logger.info(f"Updated campaign {payload.campaign_id} status to {payload.status}")
+            # Intermediate updates are skipped once a campaign has finished
+            existing = None
+            if payload.status not in FINAL_CAMPAIGN_STATUSES:
+                existing = await campaign_repo.get_by_id(payload.campaign_id)
+            if not existing:
+                logger.warning(f"Campaign {payload.campaign_id} not found for status update")
+                raise HTTPException(status_code=404, detail="Campaign not found")
+            logger.info(f"Ignored status {payload.status} for finished campaign {payload.campaign_id}")
+            campaign = existing
+        else:
+            logger.info(f"Updated campaign {payload.campaign_id} status to {payload.status}")
         
         return {
             "success": True,
@@ -65,67 +95,45 @@ async def update_campaign_status(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/campaign-progress")
-async def update_campaign_progress(
-    payload: CampaignProgressUpdate,
-    x_webhook_secret: Optional[str] = Header(None)
-):
+@router.post("/campaign-progress", status_code=202)
+async def update_campaign_progress(payload: CampaignProgressUpdate):
     """
     Webhook endpoint for Trigger.dev to update campaign progress
     
-    Called after each email is sent to update progress counters
+    Called after each email is sent to update progress counters. Counters are
+    buffered and written in batches, so the response echoes the accepted values.
     """
-    # TODO: Validate webhook secret for security
-    # if x_webhook_secret != settings.TRIGGER_WEBHOOK_SECRET:
-    #     raise HTTPException(status_code=401, detail="Invalid webhook secret")
+    if not ObjectId.is_valid(payload.campaign_id):
+        raise HTTPException(status_code=404, detail="Campaign not found")
+
+    campaign_progress_buffer.add(
+        payload.campaign_id,
+        processed=payload.processed,
+        sent=payload.sent,
+        failed=payload.failed
+    )
     
-    try:
-        campaign_repo = await get_campaign_repository()
-        
-        campaign = await campaign_repo.update_progress(
-            campaign_id=payload.campaign_id,
-            processed=payload.processed,
-            sent=payload.sent,
-            failed=payload.failed
-        )
-        
-        if not campaign:
-            logger.warning(f"Campaign {payload.campaign_id} not found for progress update")
-            raise HTTPException(status_code=404, detail="Campaign not found")
-        
-        logger.debug(f"Updated campaign {payload.campaign_id} progress: {payload.sent}/{campaign.total_contacts}")
-        
-        return {
-            "success": True,
-            "campaign_id": campaign.id,
-            "processed": campaign.processed,
-            "sent": campaign.sent,
-            "failed": campaign.failed
-        }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error updating campaign progress: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    return {
+        "success": True,
+        "campaign_id": payload.campaign_id,
+        "processed": payload.processed,
+        "sent": payload.sent,
+        "failed": payload.failed
+    }
 
 
 @router.post("/trigger-run-id")
 async def set_trigger_run_id(
     campaign_id: str,
     run_id: str,
-    x_webhook_secret: Optional[str] = Header(None)
+    campaign_repo: CampaignRepository = Depends(campaign_repository)
 ):
     """
     Webhook endpoint to store Trigger.dev run ID
     
     Called when Trigger.dev job starts
     """
-    # TODO: Validate webhook secret for security
-    
     try:
-        campaign_repo = await get_campaign_repository()
-        
         campaign = await campaign_repo.set_trigger_run_id(
             campaign_id=campaign_id,
             trigger_run_id=run_id
@@ -1,4 +1,5 @@
 from pydantic_settings import BaseSettings
+from functools import lru_cache
 from typing import Optional
 
 
@@ -14,6 +15,10 @@ class Settings(BaseSettings):
     # MongoDB settings
     mongo_uri: str
     mongo_db_name: str
+    mongo_min_pool_size: int = 10
+    mongo_max_pool_size: int = 50
+    mongo_max_idle_time_ms: int = 60000
+    mongo_server_selection_timeout_ms: int = 5000
 
     # Trigger.dev settings
     trigger_api_key: Optional[str] = None
@@ -32,5 +37,11 @@ class Settings(BaseSettings):
         case_sensitive = False
 
 
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Parse the environment and .env file once and reuse the result"""
+    return Settings()
+
+
 # Global settings instance
-settings = Settings()
+settings = get_settings()
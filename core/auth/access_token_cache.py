@@ -0,0 +1,46 @@
+"""
+In-process cache of OAuth access tokens so requests with a live token skip the token lookup
+"""
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+
+# Seconds before real expiry at which a token counts as expired, matching the refresh buffer
+ACCESS_TOKEN_REFRESH_BUFFER_SECONDS = 5 * 60
+
+# (user_id, provider) -> (access_token, epoch seconds after which it must be refreshed)
+_access_tokens: Dict[Tuple[str, str], Tuple[str, float]] = {}
+
+# (user_id, provider) -> lock held while that token is looked up or refreshed
+_refresh_locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+
+
+def get_cached_access_token(user_id: str, provider: str) -> Optional[str]:
+    """Return the cached access token if it is outside the refresh buffer"""
+    entry = _access_tokens.get((user_id, provider))
+    if entry is None:
+        return None
+    access_token, refresh_at = entry
+    if refresh_at <= time.time():
+        return None
+    return access_token
+
+
+def cache_access_token(user_id: str, provider: str, access_token: str, expiry: datetime) -> None:
+    """Remember a valid access token until it enters the refresh buffer"""
+    # Stored expiries are naive UTC
+    if expiry.tzinfo is None:
+        expiry = expiry.replace(tzinfo=timezone.utc)
+    _access_tokens[(user_id, provider)] = (access_token, expiry.timestamp() - ACCESS_TOKEN_REFRESH_BUFFER_SECONDS)
+
+
+def invalidate_access_token(user_id: str, provider: str) -> None:
+    """Forget a cached token (e.g. after reconnecting or a failed refresh)"""
+    _access_tokens.pop((user_id, provider), None)
+
+
+def get_refresh_lock(user_id: str, provider: str) -> asyncio.Lock:
+    """Lock shared by concurrent callers so one refresh serves them all"""
+    return _refresh_locks.setdefault((user_id, provider), asyncio.Lock())
@@ -3,6 +3,8 @@ from core.interfaces.repositories import UserRepository, ProviderTokenRepository
 from db.repository_factory import get_user_repository, get_provider_token_repository
 from utils.logger import logger
 from typing import Dict, Any
+from core.campaigns.auto_reply_cache import invalidate_users_with_auto_reply_cache
+from core.auth.access_token_cache import invalidate_access_token
 
 
 class OAuthService:
@@ -13,18 +15,9 @@ class OAuthService:
         user_repo: UserRepository = None,
         token_repo: ProviderTokenRepository = None
     ):
-        self.user_repo = user_repo
-        self.token_repo = token_repo
-        self._initialized = False
-
-    async def _ensure_repos_initialized(self):
-        """Ensure repositories are initialized"""
-        if not self._initialized:
-            if self.user_repo is None:
-                self.user_repo = await get_user_repository()
-            if self.token_repo is None:
-                self.token_repo = await get_provider_token_repository()
-            self._initialized = True
+        # Repositories are built at startup, so they can be resolved up front
+        self.user_repo = user_repo if user_repo is not None else get_user_repository()
+        self.token_repo = token_repo if token_repo is not None else get_provider_token_repository()
 
     async def generate_oauth_url(self, provider: OAuthProvider, state: str = None) -> str:
         """Generate OAuth authorization URL for a provider"""
@@ -43,7 +36,6 @@ class OAuthService:
         code: str
     ) -> Dict[str, Any]:
         """Handle OAuth callback - exchange code, get profile, save user and tokens"""
-        await self._ensure_repos_initialized()
         try:
             # Exchange authorization code for tokens
             logger.info(f"Exchanging code for {provider_name} tokens")
@@ -67,6 +59,8 @@ class OAuthService:
                 expiry=token_response.expiry,
                 scope=token_response.scope
             )
+            invalidate_users_with_auto_reply_cache()
+            invalidate_access_token(user.id, provider_name)
 
             response = {
                 "status": "connected",
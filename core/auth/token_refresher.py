@@ -4,23 +4,24 @@ from db.repository_factory import get_provider_token_repository
 from datetime import datetime, timedelta
 from utils.logger import logger
 from typing import Optional
+from core.campaigns.auto_reply_cache import invalidate_users_with_auto_reply_cache
+from core.auth.access_token_cache import (
+    cache_access_token,
+    get_cached_access_token,
+    get_refresh_lock,
+    invalidate_access_token
+)
 
 
 class TokenRefresher:
     """Service for refreshing OAuth tokens when they expire"""
 
     def __init__(self, token_repo: ProviderTokenRepository = None):
-        self.token_repo = token_repo
+        # Repositories are built at startup, so the default can be resolved up front
+        self.token_repo = token_repo if token_repo is not None else get_provider_token_repository()
         # Refresh tokens 5 minutes before expiry to be safe
         self.refresh_buffer_minutes = 5
-        self._initialized = False
-
-    async def _ensure_repo_initialized(self):
-        """Ensure token repository is initialized"""
-        if not self._initialized:
-            if self.token_repo is None:
-                self.token_repo = await get_provider_token_repository()
-            self._initialized = True
+        self._refresh_buffer = timedelta(minutes=self.refresh_buffer_minutes)
 
     async def ensure_valid_token(
         self,
@@ -32,7 +33,24 @@ class TokenRefresher:
         Ensure the user has valid tokens for the provider.
         Returns the access token if valid, None if refresh failed.
         """
-        await self._ensure_repo_initialized()
+        cached_token = get_cached_access_token(user_id, provider)
+        if cached_token:
+            return cached_token
+
+        async with get_refresh_lock(user_id, provider):
+            # Another caller may have loaded or refreshed the token while we waited
+            cached_token = get_cached_access_token(user_id, provider)
+            if cached_token:
+                return cached_token
+            return await self._load_or_refresh(user_id, provider, oauth_provider)
+
+    async def _load_or_refresh(
+        self,
+        user_id: str,
+        provider: str,
+        oauth_provider: OAuthProvider
+    ) -> Optional[str]:
+        """Read the stored tokens and refresh them if they are about to expire"""
         try:
             # Get current tokens
             tokens = await self.token_repo.get_by_user_and_provider(user_id, provider)
@@ -41,9 +59,10 @@ class TokenRefresher:
                 return None
 
             # Check if token is still valid (with buffer)
-            buffer_time = datetime.utcnow() + timedelta(minutes=self.refresh_buffer_minutes)
+            buffer_time = datetime.utcnow() + self._refresh_buffer
             if tokens.expiry > buffer_time:
                 # Token is still valid
+                cache_access_token(user_id, provider, tokens.access_token, tokens.expiry)
                 return tokens.access_token
 
             # Token needs refresh
@@ -63,10 +82,13 @@ class TokenRefresher:
                 refresh_token=token_response.refresh_token,  # May be the same
                 expiry=token_response.expiry
             )
+            invalidate_users_with_auto_reply_cache()
+            cache_access_token(user_id, provider, updated_tokens.access_token, updated_tokens.expiry)
 
             logger.info(f"Successfully refreshed {provider} token for user {user_id}")
             return updated_tokens.access_token
 
         except Exception as e:
             logger.error(f"Failed to refresh token for user {user_id}, provider {provider}: {e}")
+            invalidate_access_token(user_id, provider)
             return None
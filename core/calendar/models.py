@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, TypedDict
 from datetime import datetime
 
 class ConnectCalendarRequest(BaseModel):
@@ -54,6 +54,13 @@ class CalendarSlot(BaseModel):
     time_zone: str = "UTC"
 
 
+class CalendarSlotDict(TypedDict):
+    """CalendarSlot as a plain dict, for serializing large slot lists without validation"""
+    start: datetime
+    end: datetime
+    time_zone: str
+
+
 class AvailabilityResponse(BaseModel):
     """Available slots for a user's calendar"""
     connected: bool
@@ -0,0 +1,26 @@
+"""
+Short-lived caches for the auto-reply lookups polled by the Trigger.dev scheduler
+"""
+from utils.cache import TTLCache
+
+
+# Seconds a cached auto-reply lookup may be served before hitting MongoDB again
+AUTO_REPLY_CACHE_TTL = 60
+
+# user_id -> serialized campaigns for /internal/auto-reply-campaigns
+auto_reply_campaigns_cache = TTLCache(ttl=AUTO_REPLY_CACHE_TTL)
+
+# Single-entry cache for /internal/users-with-auto-reply
+users_with_auto_reply_cache = TTLCache(ttl=AUTO_REPLY_CACHE_TTL, maxsize=1)
+USERS_WITH_AUTO_REPLY_KEY = "all"
+
+
+def invalidate_users_with_auto_reply_cache() -> None:
+    """Drop the cached user/token list (e.g. after Google tokens are saved or refreshed)"""
+    users_with_auto_reply_cache.pop(USERS_WITH_AUTO_REPLY_KEY)
+
+
+def invalidate_auto_reply_cache(user_id: str) -> None:
+    """Drop cached auto-reply data after a user changes campaigns, prompts or calendar settings"""
+    auto_reply_campaigns_cache.pop(user_id)
+    invalidate_users_with_auto_reply_cache()
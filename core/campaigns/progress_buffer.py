@@ -0,0 +1,76 @@
+"""
+Coalesces campaign progress webhooks so each campaign gets at most one write per flush interval
+"""
+import asyncio
+from typing import Dict, Optional, Tuple
+from db.repository_factory import get_campaign_repository
+from utils.logger import logger
+
+
+# Seconds between flushes of buffered progress counters
+PROGRESS_FLUSH_INTERVAL = 0.5
+
+
+class CampaignProgressBuffer:
+    """Keeps the latest (processed, sent, failed) per campaign and writes them in batches"""
+
+    def __init__(self, interval: float = PROGRESS_FLUSH_INTERVAL):
+        self.interval = interval
+        self._pending: Dict[str, Tuple[int, int, int]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, campaign_id: str, processed: int, sent: int, failed: int) -> None:
+        """Record the latest counters for a campaign (replaces any unflushed value)"""
+        self._pending[campaign_id] = (processed, sent, failed)
+
+    async def flush(self) -> None:
+        """Write every buffered campaign's counters in one bulk write"""
+        if not self._pending:
+            return
+
+        # Swap before awaiting so updates arriving mid-write land in the next batch
+        batch, self._pending = self._pending, {}
+        try:
+            await get_campaign_repository().update_progress_many(batch)
+        except Exception as e:
+            logger.error(f"Error flushing progress for {len(batch)} campaigns: {str(e)}")
+            # Keep the counters for the next flush unless newer ones have arrived
+            for campaign_id, counters in batch.items():
+                self._pending.setdefault(campaign_id, counters)
+
+    async def flush_campaign(self, campaign_id: str) -> None:
+        """Write one campaign's buffered counters now (e.g. before a final status change)"""
+        counters = self._pending.pop(campaign_id, None)
+        if counters is None:
+            return
+        try:
+            await get_campaign_repository().update_progress_many({campaign_id: counters})
+        except Exception:
+            # Keep the counters so a retried status webhook can flush them again
+            self._pending.setdefault(campaign_id, counters)
+            raise
+
+    def start(self) -> None:
+        """Start the background flush loop (called on application startup)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush loop and write anything still buffered (called on shutdown)"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        """Flush buffered counters every interval"""
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+
+campaign_progress_buffer = CampaignProgressBuffer()
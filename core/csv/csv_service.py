@@ -1,23 +1,162 @@
+import asyncio
 import csv
 import io
+import multiprocessing
+import os
 import re
-from typing import List, Dict, Any, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Tuple, Optional
 from utils.logger import logger
 
 
+# Email format check, compiled once for every row of every upload
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+# Process pool for CSV parsing - created on application startup
+_parse_pool: Optional[ProcessPoolExecutor] = None
+
+
+def start_parse_pool() -> None:
+    """Create the CSV parsing process pool (called on application startup)"""
+    global _parse_pool
+    if _parse_pool is None:
+        # Workers start clean rather than as a fork of this multithreaded process
+        # (log listener, Motor), whose threads would not survive; forkserver is
+        # unavailable on Windows, where spawn is used instead
+        start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _parse_pool = ProcessPoolExecutor(
+            max_workers=os.cpu_count(),
+            mp_context=multiprocessing.get_context(start_method)
+        )
+
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    """Get the process pool used for CSV parsing"""
+    if _parse_pool is None:
+        start_parse_pool()
+    return _parse_pool
+
+
+def shutdown_parse_pool() -> None:
+    """Shut down the CSV parsing process pool"""
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=False, cancel_futures=True)
+        _parse_pool = None
+
+
+def _cell(row: List[str], index: Optional[int]) -> Optional[str]:
+    """Stripped cell value, or None if the column is absent, short or blank"""
+    if index is None or index >= len(row):
+        return None
+    return row[index].strip() or None
+
+
+def _parse_csv_worker(
+    file_content: bytes,
+    user_id: str,
+    filename: str
+) -> Tuple[List[Dict[str, Any]], List[str], Optional[str]]:
+    """
+    Parse CSV content into plain contact dicts (runs in a worker process)
+    
+    The worker does not log; anything worth logging is returned to the parent.
+    
+    Returns:
+        Tuple of (valid_contacts, error_messages, unexpected_error)
+    """
+    valid_contacts = []
+    errors = []
+    unexpected_error = None
+    
+    try:
+        # Decode file content
+        content = file_content.decode('utf-8-sig')  # Handle BOM
+        csv_reader = csv.reader(io.StringIO(content))
+        header = next(csv_reader, None)
+        
+        # Check if email column exists
+        if not header:
+            errors.append("CSV file is empty or invalid")
+            return valid_contacts, errors, unexpected_error
+        
+        # Normalize the header once and map each column name to its position
+        # (rows stay plain lists, so no per-row dicts are built)
+        columns = {name.lower().strip(): i for i, name in enumerate(header)}
+        
+        if 'email' not in columns:
+            errors.append("CSV must contain an 'email' column")
+            return valid_contacts, errors, unexpected_error
+        
+        email_i = columns['email']
+        name_i = columns.get('name')
+        company_i = columns.get('company')
+        phone_i = columns.get('phone')
+        # Columns that become custom fields are fixed by the header, so resolve them once
+        custom_columns = [
+            (key, i) for key, i in columns.items()
+            if key not in CsvService.STANDARD_FIELDS
+        ]
+        match_email = _EMAIL_RE.match
+        
+        # Process rows, skipping blank lines like DictReader did
+        rows = (row for row in csv_reader if row)
+        for idx, row in enumerate(rows, start=2):  # Start at 2 (header is row 1)
+            email = _cell(row, email_i)
+            
+            # Validate email
+            if not email:
+                errors.append(f"Row {idx}: Missing email")
+                continue
+            
+            # Cells are already stripped, so the compiled pattern can run directly
+            if not match_email(email):
+                errors.append(f"Row {idx}: Invalid email format '{email}'")
+                continue
+            
+            # Extract standard fields
+            contact_data = {
+                "user_id": user_id,
+                "email": email.lower(),
+                "name": _cell(row, name_i),
+                "company": _cell(row, company_i),
+                "phone": _cell(row, phone_i),
+                "source": filename,
+                "custom_fields": {}
+            }
+            
+            # Extract custom fields (any non-empty column not in standard fields)
+            for key, i in custom_columns:
+                value = _cell(row, i)
+                if value:
+                    contact_data["custom_fields"][key] = value
+            
+            valid_contacts.append(contact_data)
+        
+    except UnicodeDecodeError:
+        errors.append("File encoding error. Please ensure the file is UTF-8 encoded")
+    except csv.Error as e:
+        errors.append(f"CSV parsing error: {str(e)}")
+    except Exception as e:
+        unexpected_error = str(e)
+        errors.append(f"Unexpected error: {str(e)}")
+    
+    return valid_contacts, errors, unexpected_error
+
+
 class CsvService:
     """Service for processing CSV files"""
 
     # Standard CSV columns we expect
     STANDARD_FIELDS = {"email", "name", "company", "phone"}
-    EMAIL_REGEX = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+    EMAIL_RE = _EMAIL_RE
 
     @staticmethod
     def validate_email(email: str) -> bool:
         """Validate email format"""
         if not email or not isinstance(email, str):
             return False
-        return bool(re.match(CsvService.EMAIL_REGEX, email.strip()))
+        return bool(CsvService.EMAIL_RE.match(email.strip()))
 
     @staticmethod
     async def parse_csv(
@@ -28,72 +167,24 @@ class CsvService:
         """
         Parse CSV file and extract contact data
         
+        Parsing is CPU-bound, so it runs in a process pool to keep the event loop free.
+        
         Returns:
             Tuple of (valid_contacts, error_messages)
         """
-        valid_contacts = []
-        errors = []
+        loop = asyncio.get_running_loop()
+        valid_contacts, errors, unexpected_error = await loop.run_in_executor(
+            get_parse_pool(),
+            _parse_csv_worker,
+            file_content,
+            user_id,
+            filename
+        )
         
-        try:
-            # Decode file content
-            content = file_content.decode('utf-8-sig')  # Handle BOM
-            csv_reader = csv.DictReader(io.StringIO(content))
-            
-            # Check if email column exists
-            if not csv_reader.fieldnames:
-                errors.append("CSV file is empty or invalid")
-                return valid_contacts, errors
-            
-            fieldnames = [f.lower().strip() for f in csv_reader.fieldnames]
-            
-            if 'email' not in fieldnames:
-                errors.append("CSV must contain an 'email' column")
-                return valid_contacts, errors
-            
-            # Process rows
-            for idx, row in enumerate(csv_reader, start=2):  # Start at 2 (header is row 1)
-                # Normalize keys to lowercase
-                normalized_row = {k.lower().strip(): v.strip() if v else None 
-                                 for k, v in row.items()}
-                
-                email = normalized_row.get('email')
-                
-                # Validate email
-                if not email:
-                    errors.append(f"Row {idx}: Missing email")
-                    continue
-                
-                if not CsvService.validate_email(email):
-                    errors.append(f"Row {idx}: Invalid email format '{email}'")
-                    continue
-                
-                # Extract standard fields
-                contact_data = {
-                    "user_id": user_id,
-                    "email": email.lower().strip(),
-                    "name": normalized_row.get('name'),
-                    "company": normalized_row.get('company'),
-                    "phone": normalized_row.get('phone'),
-                    "source": filename,
-                    "custom_fields": {}
-                }
-                
-                # Extract custom fields (any column not in standard fields)
-                for key, value in normalized_row.items():
-                    if key not in CsvService.STANDARD_FIELDS and value:
-                        contact_data["custom_fields"][key] = value
-                
-                valid_contacts.append(contact_data)
-            
-            logger.info(f"Parsed CSV: {len(valid_contacts)} valid contacts, {len(errors)} errors")
-            
-        except UnicodeDecodeError:
-            errors.append("File encoding error. Please ensure the file is UTF-8 encoded")
-        except csv.Error as e:
-            errors.append(f"CSV parsing error: {str(e)}")
-        except Exception as e:
-            logger.error(f"Error parsing CSV: {str(e)}")
-            errors.append(f"Unexpected error: {str(e)}")
+        # Logged here because worker processes have no running log listener
+        if unexpected_error:
+            logger.error(f"Error parsing CSV: {unexpected_error}")
+        logger.info(f"Parsed CSV: {len(valid_contacts)} valid contacts, {len(errors)} errors")
         
         return valid_contacts, errors
 
@@ -108,19 +199,20 @@ class CsvService:
         Returns:
             Tuple of (unique_contacts, duplicate_emails)
         """
+        # Common case: every email is distinct and new, which set algebra settles in C
+        emails = {contact["email"] for contact in contacts_data}
+        if len(emails) == len(contacts_data) and emails.isdisjoint(existing_emails):
+            return list(contacts_data), []
+        
         unique_contacts = []
         duplicate_emails = []
-        seen_emails = set()
+        # Seed with DB emails so each row costs a single hash lookup
+        seen_emails = set(existing_emails)
         
         for contact in contacts_data:
             email = contact["email"]
             
-            # Check against existing emails in DB
-            if email in existing_emails:
-                duplicate_emails.append(email)
-                continue
-            
-            # Check for duplicates within the CSV
+            # Already in DB or earlier in this CSV
             if email in seen_emails:
                 duplicate_emails.append(email)
                 continue
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any, Set, Tuple
 from pydantic import BaseModel
 from datetime import datetime
 from bson import ObjectId
@@ -74,6 +74,11 @@ class ProviderTokenRepository(ABC):
         """Get provider tokens by user and provider"""
         pass
 
+    @abstractmethod
+    async def get_by_users_and_provider(self, user_ids: List[str], provider: str) -> List[ProviderToken]:
+        """Get provider tokens for multiple users in one query"""
+        pass
+
     @abstractmethod
     async def update_tokens(
         self,
@@ -157,6 +162,11 @@ class ContactRepository(ABC):
         """Get contact by user ID and email"""
         pass
 
+    @abstractmethod
+    async def get_existing_emails(self, user_id: str, emails: List[str]) -> Set[str]:
+        """Return which of the given (normalized) emails the user already has as contacts"""
+        pass
+
     @abstractmethod
     async def delete_by_id(self, contact_id: str) -> bool:
         """Delete a contact by ID"""
@@ -183,6 +193,16 @@ class ContactRepository(ABC):
         """Get contacts by user ID and CSV source"""
         pass
 
+    @abstractmethod
+    def iter_render_rows(self, user_id: str, source: str, limit: int = 0) -> AsyncIterator[Dict[str, Any]]:
+        """Stream raw contact dicts with only the fields templates render from (limit 0 = all)"""
+        pass
+
+    @abstractmethod
+    async def count_by_source(self, user_id: str, source: str) -> int:
+        """Count contacts for a user in a CSV source"""
+        pass
+
 
 class Template:
     """Template domain model"""
@@ -259,11 +279,31 @@ class PromptRepository(ABC):
         """Get prompts by user ID with pagination"""
         pass
 
+    @abstractmethod
+    async def get_page_and_count(
+        self,
+        user_id: str,
+        skip: int = 0,
+        limit: int = 100
+    ) -> Tuple[List[Prompt], int]:
+        """Get a page of a user's prompts and their total count in one query"""
+        pass
+
     @abstractmethod
     async def get_by_id(self, prompt_id: str) -> Optional[Prompt]:
         """Get prompt by ID"""
         pass
 
+    @abstractmethod
+    async def get_by_ids(self, prompt_ids: Set[str]) -> Dict[str, Prompt]:
+        """Get prompts by IDs, keyed by prompt ID"""
+        pass
+
+    @abstractmethod
+    async def get_owner(self, prompt_id: str) -> Optional[str]:
+        """Get the user ID that owns a prompt"""
+        pass
+
     @abstractmethod
     async def get_default_for_user(self, user_id: str) -> Optional[Prompt]:
         """Get user's default prompt"""
@@ -277,9 +317,10 @@ class PromptRepository(ABC):
         description: Optional[str] = None,
         prompt_text: Optional[str] = None,
         is_default: Optional[bool] = None,
-        is_active: Optional[bool] = None
+        is_active: Optional[bool] = None,
+        user_id: Optional[str] = None
     ) -> Optional[Prompt]:
-        """Update an existing prompt"""
+        """Update an existing prompt (restricted to user_id's prompts when given)"""
         pass
 
     @abstractmethod
@@ -288,8 +329,8 @@ class PromptRepository(ABC):
         pass
 
     @abstractmethod
-    async def delete_by_id(self, prompt_id: str) -> bool:
-        """Delete a prompt by ID"""
+    async def delete_by_id(self, prompt_id: str, user_id: Optional[str] = None) -> bool:
+        """Delete a prompt by ID (restricted to user_id's prompts when given)"""
         pass
 
     @abstractmethod
@@ -318,9 +359,15 @@ class TemplateRepository(ABC):
         self,
         user_id: str,
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        include_body: bool = True
     ) -> List[Template]:
-        """Get templates by user ID with pagination"""
+        """Get templates by user ID with pagination (body left empty when include_body is False)"""
+        pass
+
+    @abstractmethod
+    def iter_by_user(self, user_id: str, include_body: bool = True) -> AsyncIterator[Template]:
+        """Stream all of a user's templates, newest first, without loading them into a list"""
         pass
 
     @abstractmethod
@@ -336,14 +383,25 @@ class TemplateRepository(ABC):
         subject: Optional[str] = None,
         body: Optional[str] = None,
         variables: Optional[List[str]] = None,
-        is_active: Optional[bool] = None
-    ) -> Template:
-        """Update an existing template"""
+        is_active: Optional[bool] = None,
+        user_id: Optional[str] = None
+    ) -> Optional[Template]:
+        """Update an existing template (restricted to user_id's templates when given)"""
         pass
 
     @abstractmethod
-    async def delete_by_id(self, template_id: str) -> bool:
-        """Delete a template by ID"""
+    async def delete_by_id(self, template_id: str, user_id: Optional[str] = None) -> bool:
+        """Delete a template by ID (restricted to user_id's templates when given)"""
+        pass
+
+    @abstractmethod
+    async def get_owner(self, template_id: str) -> Optional[str]:
+        """Get the user ID that owns a template"""
+        pass
+
+    @abstractmethod
+    async def get_version(self, template_id: str) -> Optional[datetime]:
+        """Get a template's updated_at, or None if it does not exist"""
         pass
 
     @abstractmethod
@@ -409,6 +467,11 @@ class EmailLogRepository(ABC):
         """Create a new email log entry"""
         pass
 
+    @abstractmethod
+    async def bulk_create_logs(self, rows: List[Dict[str, Any]]) -> List[EmailLog]:
+        """Create many email log entries in one write (rows use create_log's keyword names)"""
+        pass
+
     @abstractmethod
     async def get_by_user(
         self,
@@ -544,14 +607,8 @@ class CampaignRepository(ABC):
         pass
 
     @abstractmethod
-    async def update_progress(
-        self,
-        campaign_id: str,
-        processed: int,
-        sent: int,
-        failed: int
-    ) -> Optional[Campaign]:
-        """Update campaign progress"""
+    async def update_progress_many(self, progress: Dict[str, Tuple[int, int, int]]) -> int:
+        """Set (processed, sent, failed) counters for several campaigns in one write"""
         pass
 
     @abstractmethod
@@ -14,6 +14,20 @@ class TemplateItem(BaseModel):
     created_at: datetime
     updated_at: datetime
 
+    @classmethod
+    def from_db(cls, template: Any) -> "TemplateItem":
+        """Build from a stored Template without re-validating trusted fields"""
+        return cls.model_construct(
+            id=template.id,
+            name=template.name,
+            subject=template.subject,
+            body=template.body,
+            variables=template.variables,
+            is_active=template.is_active,
+            created_at=template.created_at,
+            updated_at=template.updated_at
+        )
+
 
 class CreateTemplateRequest(BaseModel):
     """Request to create a new template"""
@@ -0,0 +1,33 @@
+"""
+Short-lived cache of template lookups shared by campaign preview and send
+"""
+from typing import Optional
+from core.interfaces.repositories import Template, TemplateRepository
+from utils.cache import TTLCache
+
+
+# Seconds a template may be served from memory; users typically preview then send within this
+TEMPLATE_CACHE_TTL = 30
+
+# template_id -> Template
+_template_cache = TTLCache(ttl=TEMPLATE_CACHE_TTL, maxsize=1024)
+
+
+async def get_template_cached(template_repo: TemplateRepository, template_id: str) -> Optional[Template]:
+    """Get a template by ID, reusing a recent lookup only while its updated_at is unchanged"""
+    template = _template_cache.get(template_id)
+    if template is not None:
+        # Edits and deletes in other workers are caught by this projected read
+        if await template_repo.get_version(template_id) == template.updated_at:
+            return template
+        _template_cache.pop(template_id)
+
+    template = await template_repo.get_by_id(template_id)
+    if template is not None:
+        _template_cache.set(template_id, template)
+    return template
+
+
+def invalidate_template_cache(template_id: str) -> None:
+    """Drop a cached template after it is updated or deleted"""
+    _template_cache.pop(template_id)
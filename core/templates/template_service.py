@@ -1,13 +1,52 @@
 import re
-from typing import List, Dict, Any
+from functools import lru_cache
+from datetime import datetime
+from typing import List, Dict, Any, Tuple
+from utils.cache import TTLCache
 from utils.logger import logger
 
 
+# Sample contact used when previewing a template without explicit data
+DEFAULT_SAMPLE_DATA: Dict[str, Any] = {
+    "name": "John Doe",
+    "email": "john@example.com",
+    "company": "Acme Inc",
+    "phone": "+1234567890"
+}
+
+# template_id -> (updated_at, compiled subject, compiled body)
+_compiled_by_id = TTLCache(ttl=3600, maxsize=1024)
+
+
+class CompiledTemplate:
+    """Template text pre-split into literal and variable segments, reusable across contacts"""
+
+    __slots__ = ("literals", "variables")
+
+    def __init__(self, literals: Tuple[str, ...], variables: Tuple[str, ...]):
+        # literals has one more entry than variables: text before, between and after placeholders
+        self.literals = literals
+        self.variables = variables
+
+    def render(self, data: Dict[str, Any]) -> str:
+        """Fill placeholders from data ([var] when missing, empty string when None)"""
+        parts = [self.literals[0]]
+        for var, literal in zip(self.variables, self.literals[1:]):
+            value = data.get(var, f"[{var}]")
+            parts.append("" if value is None else str(value))
+            parts.append(literal)
+        return "".join(parts)
+
+
 class TemplateService:
     """Service for processing email templates"""
 
     # Regex to match variables in format {{variable_name}}
     VARIABLE_PATTERN = r'\{\{(\w+)\}\}'
+    _VARIABLE_RE = re.compile(VARIABLE_PATTERN)
+
+    # Single-brace variables like {variable}, which are almost always a typo for {{variable}}
+    _MALFORMED_RE = re.compile(r'\{(?!\{)(\w+)\}(?!\})')
 
     @staticmethod
     def extract_variables(text: str) -> List[str]:
@@ -20,7 +59,7 @@ class TemplateService:
         Returns:
             List of unique variable names
         """
-        matches = re.findall(TemplateService.VARIABLE_PATTERN, text)
+        matches = TemplateService._VARIABLE_RE.findall(text)
         return list(set(matches))  # Remove duplicates
 
     @staticmethod
@@ -35,10 +74,10 @@ class TemplateService:
         Returns:
             List of unique variable names from both subject and body
         """
-        subject_vars = TemplateService.extract_variables(subject)
-        body_vars = TemplateService.extract_variables(body)
+        variable_re = TemplateService._VARIABLE_RE
+        all_vars = set(variable_re.findall(subject))
+        all_vars.update(variable_re.findall(body))
         
-        all_vars = list(set(subject_vars + body_vars))
         logger.info(f"Extracted {len(all_vars)} unique variables: {all_vars}")
         
         return sorted(all_vars)
@@ -55,22 +94,20 @@ class TemplateService:
         Returns:
             Rendered text with variables replaced
         """
-        rendered = template_text
-        
-        # Find all variables in template
-        variables = TemplateService.extract_variables(template_text)
+        return TemplateService.compile(template_text).render(data)
+
+    @staticmethod
+    def compile(template_text: str) -> CompiledTemplate:
+        """
+        Parse template text once so it can be rendered for many contacts
         
-        for var in variables:
-            placeholder = f"{{{{{var}}}}}"
-            value = data.get(var, f"[{var}]")  # Use [var] if not found
-            
-            # Convert None to empty string
-            if value is None:
-                value = ""
+        Args:
+            template_text: Template text with {{variable}} placeholders
             
-            rendered = rendered.replace(placeholder, str(value))
-        
-        return rendered
+        Returns:
+            CompiledTemplate (cached per distinct template text)
+        """
+        return _compile_template(template_text)
 
     @staticmethod
     def validate_template(subject: str, body: str) -> tuple[bool, List[str]]:
@@ -95,19 +132,45 @@ class TemplateService:
             errors.append("Email body cannot be empty")
         
         # Check for malformed variables (e.g., {variable} instead of {{variable}})
-        malformed_pattern = r'\{(?!\{)(\w+)\}(?!\})'
-        
-        malformed_in_subject = re.findall(malformed_pattern, subject)
+        malformed_in_subject = TemplateService._MALFORMED_RE.findall(subject)
         if malformed_in_subject:
             errors.append(f"Malformed variables in subject: {malformed_in_subject}. Use {{{{variable}}}} format")
         
-        malformed_in_body = re.findall(malformed_pattern, body)
+        malformed_in_body = TemplateService._MALFORMED_RE.findall(body)
         if malformed_in_body:
             errors.append(f"Malformed variables in body: {malformed_in_body}. Use {{{{variable}}}} format")
         
         is_valid = len(errors) == 0
         return is_valid, errors
 
+    @staticmethod
+    def compile_stored(
+        template_id: str,
+        version: datetime,
+        subject: str,
+        body: str
+    ) -> Tuple[CompiledTemplate, CompiledTemplate]:
+        """
+        Compile a stored template's subject and body, reusing them while the row is unchanged
+        
+        Args:
+            template_id: Template ID
+            version: Row version (updated_at); a newer value recompiles
+            subject: Email subject line
+            body: Email body text
+            
+        Returns:
+            Tuple of (compiled subject, compiled body)
+        """
+        cached = _compiled_by_id.get(template_id)
+        if cached is not None and cached[0] == version:
+            return cached[1], cached[2]
+
+        compiled_subject = TemplateService.compile(subject)
+        compiled_body = TemplateService.compile(body)
+        _compiled_by_id.set(template_id, (version, compiled_subject, compiled_body))
+        return compiled_subject, compiled_body
+
     @staticmethod
     def preview_template(
         subject: str,
@@ -127,12 +190,7 @@ class TemplateService:
         """
         if sample_data is None:
             # Use default sample data
-            sample_data = {
-                "name": "John Doe",
-                "email": "john@example.com",
-                "company": "Acme Inc",
-                "phone": "+1234567890"
-            }
+            sample_data = DEFAULT_SAMPLE_DATA
         
         rendered_subject = TemplateService.render_template(subject, sample_data)
         rendered_body = TemplateService.render_template(body, sample_data)
@@ -142,3 +200,10 @@ class TemplateService:
             "body": rendered_body
         }
 
+
+@lru_cache(maxsize=512)
+def _compile_template(template_text: str) -> CompiledTemplate:
+    """Split template text on {{variable}} placeholders"""
+    # re.split with one capture group alternates literal, variable, literal, ...
+    pieces = TemplateService._VARIABLE_RE.split(template_text)
+    return CompiledTemplate(tuple(pieces[0::2]), tuple(pieces[1::2]))
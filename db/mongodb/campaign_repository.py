@@ -1,7 +1,8 @@
-from typing import Optional, List
+from typing import Optional, List, Dict, Tuple
 from datetime import datetime
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
 
 from core.interfaces.repositories import Campaign, CampaignRepository
 from db.mongodb.schemas import CampaignDocument, PyObjectId
@@ -131,11 +132,15 @@ class MongoCampaignRepository(CampaignRepository):
             if status == "running" and not await self._has_started(campaign_id):
                 update_data["started_at"] = datetime.utcnow()
 
+            query = {"_id": ObjectId(campaign_id)}
             if status in ["completed", "failed", "cancelled"]:
                 update_data["completed_at"] = datetime.utcnow()
+            else:
+                # A delayed intermediate status must not reopen a finished campaign
+                query["status"] = {"$nin": ["completed", "failed", "cancelled"]}
 
             result = await self.collection.find_one_and_update(
-                {"_id": ObjectId(campaign_id)},
+                query,
                 {"$set": update_data},
                 return_document=True
             )
@@ -154,33 +159,25 @@ class MongoCampaignRepository(CampaignRepository):
         )
         return doc and doc.get("started_at") is not None
 
-    async def update_progress(
-        self,
-        campaign_id: str,
-        processed: int,
-        sent: int,
-        failed: int
-    ) -> Optional[Campaign]:
-        """Update campaign progress"""
-        try:
-            result = await self.collection.find_one_and_update(
+    async def update_progress_many(self, progress: Dict[str, Tuple[int, int, int]]) -> int:
+        """Set (processed, sent, failed) counters for several campaigns in one write"""
+        if not progress:
+            return 0
+
+        # Counters only grow, so $max keeps a late batch (e.g. from another worker) from rolling them back
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne(
                 {"_id": ObjectId(campaign_id)},
                 {
-                    "$set": {
-                        "processed": processed,
-                        "sent": sent,
-                        "failed": failed,
-                        "updated_at": datetime.utcnow()
-                    }
-                },
-                return_document=True
+                    "$max": {"processed": processed, "sent": sent, "failed": failed},
+                    "$set": {"updated_at": now}
+                }
             )
-
-            return self._document_to_campaign(result) if result else None
-
-        except Exception as e:
-            logger.error(f"Error updating campaign progress {campaign_id}: {str(e)}")
-            return None
+            for campaign_id, (processed, sent, failed) in progress.items()
+        ]
+        result = await self.collection.bulk_write(operations, ordered=False)
+        return result.matched_count
 
     async def set_trigger_run_id(
         self,
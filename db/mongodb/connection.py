@@ -13,7 +13,14 @@ class MongoDBConnection:
     async def connect(self):
         """Connect to MongoDB"""
         try:
-            self.client = AsyncIOMotorClient(settings.mongo_uri)
+            # One pooled client per process; keep warm connections so requests skip the TCP/TLS/auth handshake
+            self.client = AsyncIOMotorClient(
+                settings.mongo_uri,
+                minPoolSize=settings.mongo_min_pool_size,
+                maxPoolSize=settings.mongo_max_pool_size,
+                maxIdleTimeMS=settings.mongo_max_idle_time_ms,
+                serverSelectionTimeoutMS=settings.mongo_server_selection_timeout_ms
+            )
             self.database = self.client[settings.mongo_db_name]
             # Test the connection
             await self.client.admin.command('ping')
@@ -21,6 +28,36 @@ class MongoDBConnection:
         except Exception as e:
             logger.error(f"Failed to connect to MongoDB: {e}")
             raise
+        await self.ensure_indexes()
+
+    async def ensure_indexes(self):
+        """Create indexes the repositories rely on (no-op if they already exist)"""
+        indexes = [
+            # Serves the per-user template list sorted newest first
+            ("templates (user_id, created_at)", self.database.templates,
+             [("user_id", 1), ("created_at", -1)], {}),
+            # One conversation per Gmail thread; lets create_if_absent upsert atomically
+            ("conversations gmail_thread_id", self.database.conversations,
+             "gmail_thread_id", {"unique": True}),
+            # Each Gmail message is recorded once; outbound messages without an ID are exempt
+            ("conversation_messages gmail_message_id", self.database.conversation_messages,
+             "gmail_message_id",
+             {"unique": True, "partialFilterExpression": {"gmail_message_id": {"$gt": ""}}}),
+            # Serves contact lookups by email (not unique: the same email may arrive in several CSVs)
+            ("contacts (user_id, email)", self.database.contacts,
+             [("user_id", 1), ("email", 1)], {}),
+            # An email appears once per CSV source; bulk inserts skip repeats via this index
+            ("contacts (user_id, source, email) unique", self.database.contacts,
+             [("user_id", 1), ("source", 1), ("email", 1)], {"unique": True}),
+        ]
+
+        # Each index is attempted on its own so one failure cannot block the rest
+        for name, collection, keys, options in indexes:
+            try:
+                await collection.create_index(keys, **options)
+            except Exception as e:
+                # Existing duplicate data must not stop the API from starting
+                logger.warning(f"Failed to ensure MongoDB index {name}: {e}")
 
     async def disconnect(self):
         """Disconnect from MongoDB"""
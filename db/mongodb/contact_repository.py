@@ -1,13 +1,24 @@
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any, Set
 from datetime import datetime
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import BulkWriteError
 from core.interfaces.repositories import Contact, ContactRepository
 from db.mongodb.schemas import ContactDocument, PyObjectId
 from db.mongodb.connection import get_database
 from utils.logger import logger
 
 
+# Contact fields needed to render a template for a recipient
+_RENDER_PROJECTION = {"email": 1, "name": 1, "company": 1, "phone": 1, "custom_fields": 1}
+
+# MongoDB error code for a unique index violation
+DUPLICATE_KEY_ERROR = 11000
+
+# Documents per cursor round trip when streaming a whole source
+RENDER_BATCH_SIZE = 500
+
+
 class MongoContactRepository(ContactRepository):
     """MongoDB implementation of ContactRepository"""
 
@@ -81,15 +92,23 @@ class MongoContactRepository(ContactRepository):
             )
             documents.append(contact_doc.model_dump(by_alias=True, exclude={"id"}))
 
-        result = await self.collection.insert_many(documents)
-        logger.info(f"Created {len(result.inserted_ids)} contacts in bulk")
+        # Unordered so one rejected row does not stop the rest of the batch
+        rejected = set()
+        try:
+            await self.collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            write_errors = e.details.get("writeErrors", [])
+            # Rows already in this source are skipped by the unique index; anything else is a real failure
+            if any(error.get("code") != DUPLICATE_KEY_ERROR for error in write_errors):
+                raise
+            rejected = {error["index"] for error in write_errors}
+            logger.info(f"Skipped {len(rejected)} contacts already present in their source")
 
-        # Fetch created documents
-        created_contacts = await self.collection.find(
-            {"_id": {"$in": result.inserted_ids}}
-        ).to_list(length=len(result.inserted_ids))
+        # insert_many sets _id on each document, so the inserted rows need no re-fetch
+        created = [doc for index, doc in enumerate(documents) if index not in rejected]
+        logger.info(f"Created {len(created)} contacts in bulk")
 
-        return [self._document_to_domain(doc) for doc in created_contacts]
+        return [self._document_to_domain(doc) for doc in created]
 
     async def get_by_user(
         self,
@@ -120,6 +139,17 @@ class MongoContactRepository(ContactRepository):
             return self._document_to_domain(doc)
         return None
 
+    async def get_existing_emails(self, user_id: str, emails: List[str]) -> Set[str]:
+        """Return which of the given emails the user already has as contacts"""
+        if not emails:
+            return set()
+
+        cursor = self.collection.find(
+            {"user_id": ObjectId(user_id), "email": {"$in": emails}},
+            {"email": 1, "_id": 0}
+        )
+        return {doc["email"] async for doc in cursor}
+
     async def delete_by_id(self, contact_id: str) -> bool:
         """Delete a contact by ID"""
         result = await self.collection.delete_one({"_id": ObjectId(contact_id)})
@@ -179,6 +209,30 @@ class MongoContactRepository(ContactRepository):
         contacts = await cursor.to_list(length=limit)
         return [self._document_to_domain(doc) for doc in contacts]
 
+    async def iter_render_rows(
+        self,
+        user_id: str,
+        source: str,
+        limit: int = 0
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream raw contact dicts with only the fields templates render from (limit 0 = all)"""
+        cursor = self.collection.find(
+            {"user_id": ObjectId(user_id), "source": source},
+            _RENDER_PROJECTION
+        ).sort("created_at", -1).limit(limit).batch_size(RENDER_BATCH_SIZE)
+
+        # No overall cap: sources of any size stream through, one bounded batch in memory at a time
+        async for doc in cursor:
+            yield doc
+
+    async def count_by_source(self, user_id: str, source: str) -> int:
+        """Count contacts for a user in a CSV source"""
+        count = await self.collection.count_documents({
+            "user_id": ObjectId(user_id),
+            "source": source
+        })
+        return count
+
     async def delete_by_source(self, user_id: str, source: str) -> int:
         """Delete all contacts from a specific CSV source for a user"""
         result = await self.collection.delete_many({
@@ -1,7 +1,8 @@
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple, AsyncIterator
 from datetime import datetime
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
 
 from core.interfaces.repositories import Conversation, ConversationMessage
 from db.mongodb.schemas import ConversationDocument, ConversationMessageDocument, PyObjectId
@@ -73,13 +74,81 @@ class MongoConversationRepository:
             last_message_at=datetime.utcnow()
         )
 
-        result = await self.conversations.insert_one(
-            doc.model_dump(by_alias=True, exclude={"id"})
-        )
+        doc_dict = doc.model_dump(by_alias=True, exclude={"id"})
+        result = await self.conversations.insert_one(doc_dict)
 
-        created = await self.conversations.find_one({"_id": result.inserted_id})
+        # insert_one fills in _id; no need to read the document back
+        doc_dict["_id"] = result.inserted_id
         logger.info(f"Created conversation {result.inserted_id} for thread {gmail_thread_id}")
-        return self._doc_to_conversation(created)
+        return self._doc_to_conversation(doc_dict)
+
+    async def create_if_absent(
+        self,
+        user_id: str,
+        campaign_id: str,
+        email_log_id: str,
+        contact_email: str,
+        gmail_thread_id: str,
+        subject: str,
+        body: str,
+        gmail_message_id: str,
+        sent_at: Optional[datetime] = None
+    ) -> Optional[Tuple[Conversation, ConversationMessage]]:
+        """Create a conversation with its initial outbound message unless the thread already has one"""
+        conv_doc = ConversationDocument(
+            user_id=PyObjectId(user_id),
+            campaign_id=campaign_id,
+            email_log_id=email_log_id,
+            contact_email=contact_email,
+            gmail_thread_id=gmail_thread_id,
+            status="active",
+            message_count=1,
+            auto_replies_sent=0,
+            last_message_at=datetime.utcnow()
+        )
+        # The ID is generated client-side, so the message can reference the conversation
+        msg_doc = ConversationMessageDocument(
+            conversation_id=conv_doc.id,
+            campaign_id=campaign_id,
+            direction="outbound",
+            from_email="me",
+            to_email=contact_email,
+            subject=subject,
+            body=body,
+            gmail_message_id=gmail_message_id,
+            is_auto_reply=False,
+            sent_at=sent_at or datetime.utcnow()
+        )
+        conv_dict = conv_doc.model_dump(by_alias=True)
+        msg_dict = msg_doc.model_dump(by_alias=True)
+
+        # Upsert keyed on the (unique) thread ID: inserts only if no conversation exists
+        try:
+            conv_result = await self.conversations.update_one(
+                {"gmail_thread_id": gmail_thread_id},
+                {"$setOnInsert": conv_dict},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # A concurrent upsert of the same thread won the race on the unique index
+            return None
+
+        # The thread already has a conversation (and its first message)
+        if conv_result.upserted_id is None:
+            return None
+
+        try:
+            await self.messages.insert_one(msg_dict)
+        except Exception as e:
+            # Don't leave a conversation without its first message, or a retry would skip it
+            try:
+                await self.conversations.delete_one({"_id": conv_dict["_id"]})
+            except Exception as cleanup_error:
+                logger.error(f"Error removing conversation {conv_dict['_id']}: {str(cleanup_error)}")
+            raise e
+
+        logger.info(f"Created conversation {conv_dict['_id']} for thread {gmail_thread_id}")
+        return self._doc_to_conversation(conv_dict), self._doc_to_message(msg_dict)
 
     async def get_by_thread_id(self, gmail_thread_id: str) -> Optional[Conversation]:
         """Get conversation by Gmail thread ID"""
@@ -176,8 +245,8 @@ class MongoConversationRepository:
         gmail_message_id: str,
         is_auto_reply: bool = False,
         sent_at: Optional[datetime] = None
-    ) -> ConversationMessage:
-        """Add a message to conversation"""
+    ) -> Optional[ConversationMessage]:
+        """Add a message to conversation (None if the Gmail message was already recorded)"""
         doc = ConversationMessageDocument(
             conversation_id=PyObjectId(conversation_id),
             campaign_id=campaign_id,
@@ -191,12 +260,15 @@ class MongoConversationRepository:
             sent_at=sent_at or datetime.utcnow()
         )
 
-        result = await self.messages.insert_one(
-            doc.model_dump(by_alias=True, exclude={"id"})
-        )
+        doc_dict = doc.model_dump(by_alias=True, exclude={"id"})
+        try:
+            result = await self.messages.insert_one(doc_dict)
+        except DuplicateKeyError:
+            # Unique index on gmail_message_id makes the insert the dedupe check
+            return None
 
-        created = await self.messages.find_one({"_id": result.inserted_id})
-        return self._doc_to_message(created)
+        doc_dict["_id"] = result.inserted_id
+        return self._doc_to_message(doc_dict)
 
     async def get_messages(
         self,
@@ -214,6 +286,32 @@ class MongoConversationRepository:
             messages.append(self._doc_to_message(doc))
         return messages
 
+    async def iter_messages_for_context(
+        self,
+        conversation_id: str,
+        body_chars: int = 500,
+        limit: int = 100
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream messages in a conversation with bodies truncated server-side (for AI context)"""
+        pipeline = [
+            {"$match": {"conversation_id": ObjectId(conversation_id)}},
+            {"$sort": {"sent_at": 1}},
+            {"$limit": limit},
+            {
+                "$project": {
+                    "_id": 0,
+                    "direction": 1,
+                    "subject": 1,
+                    # Only the leading characters cross the wire, not full quoted reply history
+                    "body": {"$substrCP": [{"$ifNull": ["$body", ""]}, 0, body_chars]},
+                    "is_auto_reply": {"$ifNull": ["$is_auto_reply", False]},
+                    "sent_at": 1
+                }
+            }
+        ]
+        async for doc in self.messages.aggregate(pipeline):
+            yield doc
+
     async def message_exists(self, gmail_message_id: str) -> bool:
         """Check if a message already exists (to avoid duplicates)"""
         count = await self.messages.count_documents({"gmail_message_id": gmail_message_id})
@@ -75,6 +75,37 @@ class MongoEmailLogRepository(EmailLogRepository):
         
         return self._document_to_domain(doc_dict)
 
+    async def bulk_create_logs(self, rows: List[Dict[str, Any]]) -> List[EmailLog]:
+        """Create many email log entries with a single insert_many"""
+        if not rows:
+            return []
+
+        docs = [
+            EmailLogDocument(
+                user_id=PyObjectId(row["user_id"]),
+                campaign_id=row.get("campaign_id"),
+                contact_id=PyObjectId(row["contact_id"]),
+                template_id=PyObjectId(row["template_id"]),
+                to_email=row["to_email"],
+                subject=row["subject"],
+                body=row["body"],
+                status=row["status"],
+                error_message=row.get("error_message"),
+                sent_at=row.get("sent_at"),
+                gmail_message_id=row.get("gmail_message_id"),
+                gmail_thread_id=row.get("gmail_thread_id")
+            ).model_dump(by_alias=True, exclude={"id"})
+            for row in rows
+        ]
+
+        result = await self.collection.insert_many(docs, ordered=False)
+
+        for doc, inserted_id in zip(docs, result.inserted_ids):
+            doc["_id"] = inserted_id
+        logger.info(f"Created {len(docs)} email logs")
+
+        return [self._document_to_domain(doc) for doc in docs]
+
     async def get_by_user(
         self,
         user_id: str,
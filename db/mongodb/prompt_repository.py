@@ -1,4 +1,4 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Set, Tuple
 from datetime import datetime
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase
@@ -76,8 +76,38 @@ class MongoPromptRepository(PromptRepository):
         prompts = await cursor.to_list(length=limit)
         return [self._document_to_domain(doc) for doc in prompts]
 
+    async def get_page_and_count(
+        self,
+        user_id: str,
+        skip: int = 0,
+        limit: int = 100
+    ) -> Tuple[List[Prompt], int]:
+        """Get a page of a user's prompts and their total count in one query"""
+        pipeline = [
+            {"$match": {"user_id": ObjectId(user_id), "is_active": True}},
+            {
+                "$facet": {
+                    "items": [
+                        {"$sort": {"created_at": -1}},
+                        {"$skip": skip},
+                        {"$limit": limit}
+                    ],
+                    "total": [{"$count": "count"}]
+                }
+            }
+        ]
+
+        results = await self.collection.aggregate(pipeline).to_list(length=1)
+        facet = results[0] if results else {"items": [], "total": []}
+        total = facet["total"][0]["count"] if facet["total"] else 0
+        return [self._document_to_domain(doc) for doc in facet["items"]], total
+
     async def get_by_id(self, prompt_id: str) -> Optional[Prompt]:
         """Get prompt by ID"""
+        # Malformed IDs can never match, so skip the round trip
+        if not ObjectId.is_valid(prompt_id):
+            return None
+
         try:
             doc = await self.collection.find_one({"_id": ObjectId(prompt_id)})
             if doc:
@@ -87,6 +117,24 @@ class MongoPromptRepository(PromptRepository):
             logger.error(f"Error getting prompt {prompt_id}: {str(e)}")
             return None
 
+    async def get_owner(self, prompt_id: str) -> Optional[str]:
+        """Get the user ID that owns a prompt (fetches only the owner field)"""
+        if not ObjectId.is_valid(prompt_id):
+            return None
+
+        doc = await self.collection.find_one({"_id": ObjectId(prompt_id)}, {"user_id": 1})
+        return str(doc["user_id"]) if doc else None
+
+    async def get_by_ids(self, prompt_ids: Set[str]) -> Dict[str, Prompt]:
+        """Get prompts by IDs, keyed by prompt ID"""
+        object_ids = [ObjectId(pid) for pid in prompt_ids if ObjectId.is_valid(pid)]
+        if not object_ids:
+            return {}
+
+        cursor = self.collection.find({"_id": {"$in": object_ids}})
+        docs = await cursor.to_list(length=len(object_ids))
+        return {str(doc["_id"]): self._document_to_domain(doc) for doc in docs}
+
     async def get_default_for_user(self, user_id: str) -> Optional[Prompt]:
         """Get user's default prompt"""
         doc = await self.collection.find_one({
@@ -105,9 +153,13 @@ class MongoPromptRepository(PromptRepository):
         description: Optional[str] = None,
         prompt_text: Optional[str] = None,
         is_default: Optional[bool] = None,
-        is_active: Optional[bool] = None
+        is_active: Optional[bool] = None,
+        user_id: Optional[str] = None
     ) -> Optional[Prompt]:
-        """Update an existing prompt"""
+        """Update an existing prompt (restricted to user_id's prompts when given)"""
+        if not ObjectId.is_valid(prompt_id):
+            return None
+
         update_data = {"updated_at": datetime.utcnow()}
 
         if name is not None:
@@ -120,35 +172,34 @@ class MongoPromptRepository(PromptRepository):
             update_data["is_active"] = is_active
         if is_default is not None:
             update_data["is_default"] = is_default
-            # If setting as default, unset other defaults
-            if is_default:
-                doc = await self.collection.find_one({"_id": ObjectId(prompt_id)})
-                if doc:
-                    await self.collection.update_many(
-                        {"user_id": doc["user_id"], "is_default": True, "_id": {"$ne": ObjectId(prompt_id)}},
-                        {"$set": {"is_default": False, "updated_at": datetime.utcnow()}}
-                    )
+
+        query = {"_id": ObjectId(prompt_id)}
+        if user_id is not None:
+            query["user_id"] = ObjectId(user_id)
 
         result = await self.collection.find_one_and_update(
-            {"_id": ObjectId(prompt_id)},
+            query,
             {"$set": update_data},
             return_document=True
         )
 
         if result:
+            # If set as default, unset the owner's other defaults
+            if is_default:
+                await self.collection.update_many(
+                    {"user_id": result["user_id"], "is_default": True, "_id": {"$ne": result["_id"]}},
+                    {"$set": {"is_default": False, "updated_at": datetime.utcnow()}}
+                )
             logger.info(f"Updated prompt {prompt_id}")
             return self._document_to_domain(result)
         return None
 
     async def set_as_default(self, user_id: str, prompt_id: str) -> Optional[Prompt]:
         """Set a prompt as the user's default (unsets other defaults)"""
-        # Unset all defaults for this user
-        await self.collection.update_many(
-            {"user_id": ObjectId(user_id), "is_default": True},
-            {"$set": {"is_default": False, "updated_at": datetime.utcnow()}}
-        )
+        if not ObjectId.is_valid(prompt_id):
+            return None
 
-        # Set the new default
+        # Set the new default; the user_id predicate doubles as the ownership check
         result = await self.collection.find_one_and_update(
             {"_id": ObjectId(prompt_id), "user_id": ObjectId(user_id)},
             {"$set": {"is_default": True, "updated_at": datetime.utcnow()}},
@@ -156,14 +207,26 @@ class MongoPromptRepository(PromptRepository):
         )
 
         if result:
+            # Unset all other defaults for this user
+            await self.collection.update_many(
+                {"user_id": ObjectId(user_id), "is_default": True, "_id": {"$ne": result["_id"]}},
+                {"$set": {"is_default": False, "updated_at": datetime.utcnow()}}
+            )
             logger.info(f"Set prompt {prompt_id} as default for user {user_id}")
             return self._document_to_domain(result)
         return None
 
-    async def delete_by_id(self, prompt_id: str) -> bool:
+    async def delete_by_id(self, prompt_id: str, user_id: Optional[str] = None) -> bool:
         """Delete a prompt by ID (soft delete by setting is_active=False)"""
+        if not ObjectId.is_valid(prompt_id):
+            return False
+
+        query = {"_id": ObjectId(prompt_id)}
+        if user_id is not None:
+            query["user_id"] = ObjectId(user_id)
+
         result = await self.collection.update_one(
-            {"_id": ObjectId(prompt_id)},
+            query,
             {"$set": {"is_active": False, "updated_at": datetime.utcnow()}}
         )
 
@@ -1,4 +1,4 @@
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from core.interfaces.repositories import ProviderTokenRepository, ProviderToken
 from .schemas import ProviderTokenDocument
@@ -15,6 +15,21 @@ class MongoProviderTokenRepository(ProviderTokenRepository):
         self.database = database if database is not None else get_database()
         self.collection = self.database["provider_tokens"]
 
+    def _document_to_domain(self, doc: Dict[str, Any]) -> ProviderToken:
+        """Convert MongoDB document to domain model"""
+        token_doc = ProviderTokenDocument(**doc)
+        return ProviderToken(
+            id=str(token_doc.id),
+            user_id=str(token_doc.user_id),
+            provider=token_doc.provider,
+            access_token=token_doc.access_token,
+            refresh_token=token_doc.refresh_token,
+            expiry=token_doc.expiry,
+            scope=token_doc.scope,
+            created_at=token_doc.created_at,
+            updated_at=token_doc.updated_at
+        )
+
     async def save_tokens(
         self,
         user_id: str,
@@ -69,23 +84,25 @@ class MongoProviderTokenRepository(ProviderTokenRepository):
             })
 
             if doc:
-                token_doc = ProviderTokenDocument(**doc)
-                return ProviderToken(
-                    id=str(token_doc.id),
-                    user_id=str(token_doc.user_id),
-                    provider=token_doc.provider,
-                    access_token=token_doc.access_token,
-                    refresh_token=token_doc.refresh_token,
-                    expiry=token_doc.expiry,
-                    scope=token_doc.scope,
-                    created_at=token_doc.created_at,
-                    updated_at=token_doc.updated_at
-                )
+                return self._document_to_domain(doc)
             return None
         except Exception as e:
             logger.error(f"Error getting tokens for user {user_id}, provider {provider}: {e}")
             raise
 
+    async def get_by_users_and_provider(self, user_ids: List[str], provider: str) -> List[ProviderToken]:
+        """Get provider tokens for multiple users in one query"""
+        try:
+            cursor = self.collection.find({
+                "user_id": {"$in": [ObjectId(user_id) for user_id in user_ids]},
+                "provider": provider
+            })
+            docs = await cursor.to_list(length=None)
+            return [self._document_to_domain(doc) for doc in docs]
+        except Exception as e:
+            logger.error(f"Error getting tokens for {len(user_ids)} users, provider {provider}: {e}")
+            raise
+
     async def update_tokens(
         self,
         token_id: str,
@@ -109,18 +126,7 @@ class MongoProviderTokenRepository(ProviderTokenRepository):
             )
 
             if result:
-                token_doc = ProviderTokenDocument(**result)
-                return ProviderToken(
-                    id=str(token_doc.id),
-                    user_id=str(token_doc.user_id),
-                    provider=token_doc.provider,
-                    access_token=token_doc.access_token,
-                    refresh_token=token_doc.refresh_token,
-                    expiry=token_doc.expiry,
-                    scope=token_doc.scope,
-                    created_at=token_doc.created_at,
-                    updated_at=token_doc.updated_at
-                )
+                return self._document_to_domain(result)
             else:
                 raise ValueError(f"Token with id {token_id} not found")
         except Exception as e:
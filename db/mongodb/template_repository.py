@@ -1,4 +1,4 @@
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any
 from datetime import datetime
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase
@@ -23,7 +23,7 @@ class MongoTemplateRepository(TemplateRepository):
             user_id=str(doc["user_id"]),
             name=doc["name"],
             subject=doc["subject"],
-            body=doc["body"],
+            body=doc.get("body", ""),
             variables=doc.get("variables", []),
             is_active=doc.get("is_active", True),
             created_at=doc["created_at"],
@@ -60,16 +60,30 @@ class MongoTemplateRepository(TemplateRepository):
         self,
         user_id: str,
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        include_body: bool = True
     ) -> List[Template]:
-        """Get templates by user ID with pagination"""
+        """Get templates by user ID with pagination (body left empty when include_body is False)"""
+        projection = None if include_body else {"body": 0}
         cursor = self.collection.find(
-            {"user_id": ObjectId(user_id)}
+            {"user_id": ObjectId(user_id)},
+            projection
         ).sort("created_at", -1).skip(skip).limit(limit)
 
         templates = await cursor.to_list(length=limit)
         return [self._document_to_domain(doc) for doc in templates]
 
+    async def iter_by_user(self, user_id: str, include_body: bool = True) -> AsyncIterator[Template]:
+        """Stream all of a user's templates, newest first, without loading them into a list"""
+        projection = None if include_body else {"body": 0}
+        cursor = self.collection.find(
+            {"user_id": ObjectId(user_id)},
+            projection
+        ).sort("created_at", -1)
+
+        async for doc in cursor:
+            yield self._document_to_domain(doc)
+
     async def get_by_id(self, template_id: str) -> Optional[Template]:
         """Get template by ID"""
         doc = await self.collection.find_one({"_id": ObjectId(template_id)})
@@ -85,9 +99,13 @@ class MongoTemplateRepository(TemplateRepository):
         subject: Optional[str] = None,
         body: Optional[str] = None,
         variables: Optional[List[str]] = None,
-        is_active: Optional[bool] = None
-    ) -> Template:
-        """Update an existing template"""
+        is_active: Optional[bool] = None,
+        user_id: Optional[str] = None
+    ) -> Optional[Template]:
+        """Update an existing template (restricted to user_id's templates when given)"""
+        if not ObjectId.is_valid(template_id):
+            return None
+
         update_data = {"updated_at": datetime.utcnow()}
         
         if name is not None:
@@ -101,8 +119,12 @@ class MongoTemplateRepository(TemplateRepository):
         if is_active is not None:
             update_data["is_active"] = is_active
 
+        query = {"_id": ObjectId(template_id)}
+        if user_id is not None:
+            query["user_id"] = ObjectId(user_id)
+
         result = await self.collection.find_one_and_update(
-            {"_id": ObjectId(template_id)},
+            query,
             {"$set": update_data},
             return_document=True
         )
@@ -110,18 +132,40 @@ class MongoTemplateRepository(TemplateRepository):
         if result:
             logger.info(f"Updated template {template_id}")
             return self._document_to_domain(result)
-        
-        raise ValueError(f"Template {template_id} not found")
+        return None
+
+    async def delete_by_id(self, template_id: str, user_id: Optional[str] = None) -> bool:
+        """Delete a template by ID (restricted to user_id's templates when given)"""
+        if not ObjectId.is_valid(template_id):
+            return False
 
-    async def delete_by_id(self, template_id: str) -> bool:
-        """Delete a template by ID"""
-        result = await self.collection.delete_one({"_id": ObjectId(template_id)})
+        query = {"_id": ObjectId(template_id)}
+        if user_id is not None:
+            query["user_id"] = ObjectId(user_id)
+
+        result = await self.collection.delete_one(query)
         
         if result.deleted_count > 0:
             logger.info(f"Deleted template {template_id}")
             return True
         return False
 
+    async def get_owner(self, template_id: str) -> Optional[str]:
+        """Get the user ID that owns a template (fetches only the owner field)"""
+        if not ObjectId.is_valid(template_id):
+            return None
+
+        doc = await self.collection.find_one({"_id": ObjectId(template_id)}, {"user_id": 1})
+        return str(doc["user_id"]) if doc else None
+
+    async def get_version(self, template_id: str) -> Optional[datetime]:
+        """Get a template's updated_at (fetches only that field)"""
+        if not ObjectId.is_valid(template_id):
+            return None
+
+        doc = await self.collection.find_one({"_id": ObjectId(template_id)}, {"updated_at": 1})
+        return doc.get("updated_at") if doc else None
+
     async def count_by_user(self, user_id: str) -> int:
         """Count total templates for a user"""
         count = await self.collection.count_documents({"user_id": ObjectId(user_id)})
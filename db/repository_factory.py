@@ -9,7 +9,7 @@ from db.mongodb.conversation_repository import MongoConversationRepository
 from db.mongodb.prompt_repository import MongoPromptRepository
 from db.mongodb.connection import get_database, mongodb_connection
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from typing import Optional
+from typing import Optional, Dict, Any
 
 
 class RepositoryFactory:
@@ -17,95 +17,105 @@ class RepositoryFactory:
 
     def __init__(self, database: Optional[AsyncIOMotorDatabase] = None):
         self.database = database
-
-    async def create_user_repository(self) -> UserRepository:
+        # Repositories are stateless wrappers around collections, so one instance per type is enough
+        self._repositories: Dict[type, Any] = {}
+
+    def _get_or_create(self, repository_class: type) -> Any:
+        """Return the cached repository instance, creating it on first use"""
+        repository = self._repositories.get(repository_class)
+        if repository is None:
+            if self.database is None:
+                self.database = mongodb_connection.get_database()
+            repository = repository_class(self.database)
+            self._repositories[repository_class] = repository
+        return repository
+
+    def initialize(self) -> None:
+        """Eagerly create every repository (called once the database is connected)"""
+        for create in (
+            self.create_user_repository,
+            self.create_provider_token_repository,
+            self.create_contact_repository,
+            self.create_template_repository,
+            self.create_email_log_repository,
+            self.create_campaign_repository,
+            self.create_conversation_repository,
+            self.create_prompt_repository,
+        ):
+            create()
+
+    def create_user_repository(self) -> UserRepository:
         """Create user repository instance"""
-        if self.database is None:
-            self.database = mongodb_connection.get_database()
-        return MongoUserRepository(self.database)
+        return self._get_or_create(MongoUserRepository)
 
-    async def create_provider_token_repository(self) -> ProviderTokenRepository:
+    def create_provider_token_repository(self) -> ProviderTokenRepository:
         """Create provider token repository instance"""
-        if self.database is None:
-            self.database = mongodb_connection.get_database()
-        return MongoProviderTokenRepository(self.database)
+        return self._get_or_create(MongoProviderTokenRepository)
 
-    async def create_contact_repository(self) -> ContactRepository:
+    def create_contact_repository(self) -> ContactRepository:
         """Create contact repository instance"""
-        if self.database is None:
-            self.database = mongodb_connection.get_database()
-        return MongoContactRepository(self.database)
+        return self._get_or_create(MongoContactRepository)
 
-    async def create_template_repository(self) -> TemplateRepository:
+    def create_template_repository(self) -> TemplateRepository:
         """Create template repository instance"""
-        if self.database is None:
-            self.database = mongodb_connection.get_database()
-        return MongoTemplateRepository(self.database)
+        return self._get_or_create(MongoTemplateRepository)
 
-    async def create_email_log_repository(self) -> EmailLogRepository:
+    def create_email_log_repository(self) -> EmailLogRepository:
         """Create email log repository instance"""
-        if self.database is None:
-            self.database = mongodb_connection.get_database()
-        return MongoEmailLogRepository(self.database)
+        return self._get_or_create(MongoEmailLogRepository)
 
-    async def create_campaign_repository(self) -> CampaignRepository:
+    def create_campaign_repository(self) -> CampaignRepository:
         """Create campaign repository instance"""
-        if self.database is None:
-            self.database = mongodb_connection.get_database()
-        return MongoCampaignRepository(self.database)
+        return self._get_or_create(MongoCampaignRepository)
 
-    async def create_conversation_repository(self) -> MongoConversationRepository:
+    def create_conversation_repository(self) -> MongoConversationRepository:
         """Create conversation repository instance"""
-        if self.database is None:
-            self.database = mongodb_connection.get_database()
-        return MongoConversationRepository(self.database)
+        return self._get_or_create(MongoConversationRepository)
 
-    async def create_prompt_repository(self) -> PromptRepository:
+    def create_prompt_repository(self) -> PromptRepository:
         """Create prompt repository instance"""
-        if self.database is None:
-            self.database = mongodb_connection.get_database()
-        return MongoPromptRepository(self.database)
+        return self._get_or_create(MongoPromptRepository)
 
 
 # Global factory instance
 repository_factory = RepositoryFactory()
 
 
-async def get_user_repository() -> UserRepository:
+def get_user_repository() -> UserRepository:
     """Convenience function to get user repository"""
-    return await repository_factory.create_user_repository()
+    return repository_factory.create_user_repository()
 
 
-async def get_provider_token_repository() -> ProviderTokenRepository:
+def get_provider_token_repository() -> ProviderTokenRepository:
     """Convenience function to get provider token repository"""
-    return await repository_factory.create_provider_token_repository()
+    return repository_factory.create_provider_token_repository()
 
 
-async def get_contact_repository() -> ContactRepository:
+def get_contact_repository() -> ContactRepository:
     """Convenience function to get contact repository"""
-    return await repository_factory.create_contact_repository()
+    return repository_factory.create_contact_repository()
 
 
-async def get_template_repository() -> TemplateRepository:
+def get_template_repository() -> TemplateRepository:
     """Convenience function to get template repository"""
-    return await repository_factory.create_template_repository()
+    return repository_factory.create_template_repository()
 
 
-async def get_email_log_repository() -> EmailLogRepository:
+def get_email_log_repository() -> EmailLogRepository:
     """Convenience function to get email log repository"""
-    return await repository_factory.create_email_log_repository()
+    return repository_factory.create_email_log_repository()
 
 
-async def get_campaign_repository() -> CampaignRepository:
+def get_campaign_repository() -> CampaignRepository:
     """Convenience function to get campaign repository"""
-    return await repository_factory.create_campaign_repository()
+    return repository_factory.create_campaign_repository()
 
 
-async def get_conversation_repository() -> MongoConversationRepository:
+def get_conversation_repository() -> MongoConversationRepository:
     """Convenience function to get conversation repository"""
-    return await repository_factory.create_conversation_repository()
+    return repository_factory.create_conversation_repository()
 
 
-async def get_prompt_repository() -> PromptRepository:
+def get_prompt_repository() -> PromptRepository:
     """Convenience function to get prompt repository"""
-    return await repository_factory.create_prompt_repository()
+    return repository_factory.create_prompt_repository()
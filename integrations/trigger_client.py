@@ -1,4 +1,5 @@
 import httpx
+import orjson
 from typing import Optional, Dict, Any
 from config import settings
 from utils.logger import logger
@@ -74,7 +75,7 @@ class TriggerClient:
                         "Authorization": f"Bearer {self.api_key}",
                         "Content-Type": "application/json"
                     },
-                    json=request_body
+                    content=orjson.dumps(request_body)
                 )
                 
                 response.raise_for_status()
@@ -1,5 +1,7 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from api.routes.auth_routes import router as auth_router
 from api.routes.provider_routes import router as provider_router
 from api.routes.contact_routes import router as contact_router
@@ -10,6 +12,10 @@ from api.routes.calendar_routes import router as calendar_router
 from api.routes.internal_routes import router as internal_router
 from api.webhooks.trigger_webhooks import router as trigger_webhook_router
 from db.mongodb.connection import mongodb_connection
+from db.repository_factory import repository_factory
+from core.csv.csv_service import start_parse_pool, shutdown_parse_pool
+from core.campaigns.progress_buffer import campaign_progress_buffer
+from integrations.http_client import close_http_client
 from utils.logger import logger
 import uvicorn
 
@@ -20,7 +26,8 @@ app = FastAPI(
     description="OAuth integration for email marketing campaigns",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -32,12 +39,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger JSON payloads (contact/log lists repeat the same keys per item)
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 
 @app.on_event("startup")
 async def startup_event():
     """Application startup event"""
     logger.info("Starting Lead Contact API...")
     await mongodb_connection.connect()
+    repository_factory.initialize()
+    start_parse_pool()
+    campaign_progress_buffer.start()
     logger.info("Application startup complete")
 
 
@@ -45,7 +58,10 @@ async def startup_event():
 async def shutdown_event():
     """Application shutdown event"""
     logger.info("Shutting down Lead Contact API...")
+    await campaign_progress_buffer.stop()
     await mongodb_connection.disconnect()
+    shutdown_parse_pool()
+    await close_http_client()
     logger.info("Application shutdown complete")
 
 
@@ -1,8 +1,10 @@
 import httpx
 import base64
+import orjson
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from typing import Dict, Any
+from integrations.http_client import get_http_client
 from utils.logger import logger
 
 
@@ -78,18 +80,17 @@ class GmailSendService:
                 "Content-Type": "application/json"
             }
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    GmailSendService.GMAIL_SEND_URL,
-                    headers=headers,
-                    json=message,
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                result = response.json()
-                
-                logger.info(f"Email sent successfully to {to}, message ID: {result.get('id')}")
-                return result
+            response = await get_http_client().post(
+                GmailSendService.GMAIL_SEND_URL,
+                headers=headers,
+                content=orjson.dumps(message),
+                timeout=30.0
+            )
+            response.raise_for_status()
+            result = response.json()
+            
+            logger.info(f"Email sent successfully to {to}, message ID: {result.get('id')}")
+            return result
                 
         except httpx.HTTPError as e:
             logger.error(f"Failed to send email to {to}: {str(e)}")
@@ -115,13 +116,9 @@ class GmailSendService:
         Returns:
             Dictionary with success/failure counts
         """
-        results = {
-            "total": len(emails),
-            "sent": 0,
-            "failed": 0,
-            "errors": []
-        }
-        
+        # Tally into locals and build the result dict once
+        sent = 0
+        errors = []
         for email in emails:
             try:
                 await GmailSendService.send_email(
@@ -131,14 +128,17 @@ class GmailSendService:
                     body=email['body'],
                     from_email=from_email
                 )
-                results["sent"] += 1
+                sent += 1
             except Exception as e:
-                results["failed"] += 1
-                results["errors"].append({
+                errors.append({
                     "to": email['to'],
                     "error": str(e)
                 })
                 logger.error(f"Failed to send to {email['to']}: {str(e)}")
         
-        return results
-
+        return {
+            "total": len(emails),
+            "sent": sent,
+            "failed": len(errors),
+            "errors": errors
+        }
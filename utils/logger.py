@@ -1,5 +1,8 @@
+import atexit
 import logging
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
 from config import settings
 
 
@@ -23,8 +26,16 @@ def setup_logger(name: str = "lead_contact_app") -> logging.Logger:
     )
     handler.setFormatter(formatter)
 
+    # Request handlers only enqueue records; formatting and stdout writes
+    # happen on the listener's background thread instead of the event loop
+    log_queue: queue.Queue = queue.Queue(-1)
+    listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    # Flush anything still queued when the process exits
+    atexit.register(listener.stop)
+
     # Add handler to logger
-    logger.addHandler(handler)
+    logger.addHandler(QueueHandler(log_queue))
 
     return logger
 